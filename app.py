@@ -1,13 +1,18 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, session
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, get_flashed_messages, jsonify, send_file, session, Response, stream_with_context
 import os
+import hashlib
+import hmac
+import random
 import secrets
+import tempfile
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
+from sqlalchemy.exc import IntegrityError
 from flask_migrate import Migrate
 from datetime import datetime, date, timedelta
 import base64
 import re
 import time
-from collections import defaultdict
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
@@ -22,49 +27,82 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)  # Sesión expira en 2 horas
 
-# Rate limiting simple
-login_attempts = defaultdict(list)
+# Geocodificación inversa en el servidor (ver geocoding.py)
+app.config['GEOCODE_PROVIDER'] = os.environ.get('GEOCODE_PROVIDER', 'nominatim')
+app.config['GEOCODE_GRID_METERS'] = 50
+app.config['GEOCODE_TTL_DAYS'] = 30
+app.config['GEOCODE_MAX_ENTRIES'] = 10000
+app.config['GEOCODE_MIN_INTERVAL'] = 1  # Política de uso de Nominatim: una consulta por segundo
+app.config['GEOCODE_FAILURE_TTL'] = 300
+
+# Proxies inversos delante de la aplicación (ej. 1 con nginx). Solo con un valor mayor a 0
+# se leen X-Forwarded-For y X-Forwarded-Proto, y solo las entradas que agregaron esos
+# proxies: sin proxy cualquier cliente podría inventar su IP.
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+if app.config['TRUSTED_PROXIES'] > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=app.config['TRUSTED_PROXIES'])
+
+# Rate limiting compartido entre workers (ver rate_limit.py); 'memory' para uno por proceso
+app.config['RATE_LIMIT_STORAGE'] = os.environ.get('RATE_LIMIT_STORAGE', os.path.join(app.instance_path, 'rate_limit.db'))
 MAX_LOGIN_ATTEMPTS = 5
 LOCKOUT_TIME = 300  # 5 minutos
+# Escaneos por minuto por kiosco autenticado (o por IP si no envía token). En el envío por
+# lotes cuenta cada escaneo; debe permitir al menos un lote completo (MAX_BATCH_SCANS).
+MAX_SCANS_PER_MINUTE = 600
+
+# Kioscos autorizados (tokens separados por coma): el kiosco envía su token en la cabecera
+# X-Kiosk-Token y solo así sus escaneos en cola se registran con la hora del kiosco
+app.config['KIOSK_TOKENS'] = [token.strip() for token in os.environ.get('KIOSK_TOKENS', '').split(',') if token.strip()]
+
+# Cookie con el token del kiosco, solo para /events (EventSource no puede enviar cabeceras)
+KIOSK_COOKIE = 'kiosk_token'
+KIOSK_COOKIE_MAX_AGE = 365 * 24 * 3600  # Se renueva cada vez que el kiosco abre el escáner
+
+def kiosk_id(token=None):
+    """
+    Identificador del kiosco autenticado (hash de su token), o None. Sin token se usa
+    la cabecera X-Kiosk-Token.
+    """
+    if token is None:
+        token = request.headers.get('X-Kiosk-Token', '')
+    if not token:
+        return None
+    for known in app.config['KIOSK_TOKENS']:
+        if hmac.compare_digest(token.encode(), known.encode()):
+            return hashlib.sha256(known.encode()).hexdigest()[:16]
+    return None
+
+from rate_limit import RateLimiter, create_backend, client_ip, rate_limited
+rate_limit_backend = create_backend(app.config['RATE_LIMIT_STORAGE'])
+login_limiter = RateLimiter('login', MAX_LOGIN_ATTEMPTS, LOCKOUT_TIME, rate_limit_backend)
+scan_limiter = RateLimiter('escaneo', MAX_SCANS_PER_MINUTE, 60, rate_limit_backend)
+
+def scan_client():
+    """Clave del límite de escaneos: el kiosco autenticado, así varios kioscos detrás de un NAT no comparten cupo."""
+    kiosk = kiosk_id()
+    return f"kiosco:{kiosk}" if kiosk else client_ip()
+
+def batch_scan_count():
+    """Escaneos de un envío por lotes, para el límite (un lote inválido cuenta como uno)."""
+    data = request.get_json(silent=True)
+    scans = data.get('scans') if isinstance(data, dict) else None
+    return min(len(scans), MAX_BATCH_SCANS) if isinstance(scans, list) and scans else 1
 
 from models import db, Employee, Attendance, WorkSchedule, AdminUser
+from extensions import enable_sqlite_pragmas
+from group_commit import GroupCommitWriter, WriterBusyError
 
 import pandas as pd
 
-# Funciones de validación de seguridad
-def validate_employee_id(employee_id):
-    """Validar formato de ID de empleado"""
-    if not employee_id or len(employee_id) > 20:
-        return False
-    return re.match(r'^[A-Za-z0-9_-]+$', employee_id) is not None
-
-def validate_email(email):
-    """Validar formato de email"""
-    if not email or len(email) > 120:
-        return False
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
-
-def validate_name(name):
-    """Validar nombres (solo letras, espacios y acentos)"""
-    if not name or len(name) > 100:
-        return False
-    pattern = r'^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+$'
-    return re.match(pattern, name) is not None
+from validators import validate_employee_id, validate_email, validate_name
 
 def is_rate_limited(ip_address):
     """Verificar si una IP está limitada por intentos de login"""
-    now = time.time()
-    attempts = login_attempts[ip_address]
-    
-    # Limpiar intentos antiguos
-    attempts[:] = [attempt for attempt in attempts if now - attempt < LOCKOUT_TIME]
-    
-    return len(attempts) >= MAX_LOGIN_ATTEMPTS
+    return login_limiter.is_limited(ip_address)
 
 def add_login_attempt(ip_address):
     """Registrar un intento de login fallido"""
-    login_attempts[ip_address].append(time.time())
+    login_limiter.hit(ip_address)
 
 def generate_csrf_token():
     """Generar token CSRF"""
@@ -120,8 +158,8 @@ def admin_login_required(f):
 def login():
     if request.method == 'POST':
         # Verificar rate limiting
-        client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
-        if is_rate_limited(client_ip):
+        ip_address = client_ip()
+        if is_rate_limited(ip_address):
             flash('Demasiados intentos de login. Intenta de nuevo en 5 minutos.', 'danger')
             return render_template('login.html')
         
@@ -151,14 +189,13 @@ def login():
             session.permanent = True
             
             # Limpiar intentos fallidos
-            if client_ip in login_attempts:
-                del login_attempts[client_ip]
+            login_limiter.reset(ip_address)
             
             flash('Bienvenido, administrador.', 'success')
             return redirect(url_for('admin_dashboard'))
         else:
             # Registrar intento fallido
-            add_login_attempt(client_ip)
+            add_login_attempt(ip_address)
             flash('Usuario o contraseña incorrectos.', 'danger')
     
     return render_template('login.html')
@@ -171,13 +208,9 @@ def logout():
     return redirect(url_for('scanner'))
 
 
-@app.route('/admin')
-@admin_login_required
-def admin_dashboard():
-    today = date.today()
-    total_empleados = Employee.query.filter_by(is_active=True).count()
-    total_asistencias = Attendance.query.filter_by(date=today, attendance_type='entrada').count()
-    llegadas_tarde = Attendance.query.filter_by(date=today, attendance_type='entrada', is_late=True).count()
+def render_admin_dashboard():
+    """Renderiza el dashboard leyendo los contadores mantenidos incrementalmente"""
+    total_empleados, total_asistencias, llegadas_tarde = get_dashboard_counts(date.today())
     porcentaje_asistencia = 0
     if total_empleados > 0:
         porcentaje_asistencia = round((total_asistencias / total_empleados) * 100, 2)
@@ -185,7 +218,13 @@ def admin_dashboard():
         total_empleados=total_empleados,
         total_asistencias=total_asistencias,
         llegadas_tarde=llegadas_tarde,
-        porcentaje_asistencia=porcentaje_asistencia)
+        porcentaje_asistencia=porcentaje_asistencia,
+        dashboard_date=date.today().isoformat())
+
+@app.route('/admin')
+@admin_login_required
+def admin_dashboard():
+    return render_admin_dashboard()
 
 
 @app.route("/export_excel", methods=["POST"])
@@ -193,166 +232,145 @@ def export_excel():
     start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
     end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
     employee_id = request.form.get('employee_id')
-    
-    if employee_id:
-        # Para reporte individual, usar listado completo
-        from reports import generate_individual_report
-        summary, error = generate_individual_report(start_date, end_date, employee_id)
-    else:
-        # Para reporte general, usar listado detallado de todos los empleados
-        from reports import generate_general_detailed_report
-        summary, error = generate_general_detailed_report(start_date, end_date)
-    
-    # Filtrar la columna attendance_id para el Excel
-    if summary is not None and 'attendance_id' in summary.columns:
-        summary = summary.drop(['attendance_id'], axis=1)
-    
-    filename = "reporte_asistencia.xlsx"
-    filepath = f"static/{filename}"
-    summary.to_excel(filepath, index=False)
-    return send_file(filepath, as_attachment=True, download_name=filename)
+
+    # Archivo temporal propio de la solicitud: se borra al cerrar la respuesta
+    from exports import write_excel_report
+    buffer = tempfile.TemporaryFile()
+    try:
+        write_excel_report(buffer, start_date, end_date, employee_id=employee_id)
+    except Exception:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return send_file(buffer, as_attachment=True, download_name="reporte_asistencia.xlsx",
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
 db.init_app(app)
 migrate = Migrate(app, db)
-
-from qr_generator import generate_qr_code
+enable_sqlite_pragmas(app)
+
+# Los escaneos se guardan por un escritor único que agrupa los commits (ver group_commit.py)
+app.config['GROUP_COMMIT_ENABLED'] = True
+app.config['GROUP_COMMIT_MAX_BATCH'] = 200
+attendance_writer = GroupCommitWriter(app)
+# Las direcciones de los escaneos con solo coordenadas se completan después del commit
+from geocoding import AddressResolver
+address_resolver = AddressResolver(app, attendance_writer)
+
+# Cada cuánto la página del escáner pide registros nuevos a /scanner/feed
+SCANNER_FEED_POLL_MS = 5000
+
+# Exportaciones PDF/Excel en segundo plano (ver jobs.py)
+app.config['EXPORT_JOB_DIR'] = os.path.join(app.instance_path, 'exports')
+app.config['EXPORT_JOB_WORKERS'] = 2
+app.config['EXPORT_JOB_TTL'] = 3600
+from jobs import ExportJobRunner, EXPORT_FORMATS, DONE as EXPORT_DONE
+export_jobs = ExportJobRunner(app)
+# Cada cuánto la página de reportes consulta el avance de una exportación
+EXPORT_JOB_POLL_MS = 1000
+
+from qr_generator import get_qr_image, qr_content_hash, QR_FORMATS, QR_TIERS, QR_DEFAULT_TIER
+from attendance_service import record_scan, register_scan_batch, parse_coordinate, purge_scan_ingestions, MAX_BATCH_SCANS
+# Uno de cada tantos envíos por lote borra resultados de escaneos vencidos (ver SCAN_INGESTION_RETENTION)
+SCAN_PURGE_EVERY = 100
+from daily_summary import refresh_daily_summary
+from roster import get_active_roster
+from scanner_feed import get_feed
+# Eventos en vivo (SSE) compartidos entre workers a través de la tabla LiveEvent (ver events.py)
+app.config['EVENT_POLL_SECONDS'] = 1
+app.config['EVENT_RETENTION'] = 3600
+# Conexiones a /events por worker: cada una ocupa un hilo, deben sobrar hilos (--threads) para el resto
+app.config['EVENT_MAX_SUBSCRIBERS'] = 50
+from events import EventBroker, event_stream_response, queue_event
+event_broker = EventBroker(app)
+from counters import get_dashboard_counts, increment, touch_date, ACTIVE_EMPLOYEES, ATTENDANCE_EDITS, EMPLOYEE_EDITS
 from reports import generate_daily_report, generate_attendance_chart, generate_department_chart, generate_pdf_report, get_attendance_data
 
 @app.route('/')
 def index():
     if session.get('admin_user_id'):
-        today = date.today()
-        total_empleados = Employee.query.filter_by(is_active=True).count()
-        total_asistencias = Attendance.query.filter_by(date=today, attendance_type='entrada').count()
-        llegadas_tarde = Attendance.query.filter_by(date=today, attendance_type='entrada', is_late=True).count()
-        porcentaje_asistencia = 0
-        if total_empleados > 0:
-            porcentaje_asistencia = round((total_asistencias / total_empleados) * 100, 2)
-        return render_template('admin_dashboard.html',
-            total_empleados=total_empleados,
-            total_asistencias=total_asistencias,
-            llegadas_tarde=llegadas_tarde,
-            porcentaje_asistencia=porcentaje_asistencia)
-    else:
-        return redirect(url_for('scanner'))
-    if session.get('admin_user_id'):
-        today = date.today()
-        total_empleados = Employee.query.filter_by(is_active=True).count()
-        total_asistencias = Attendance.query.filter_by(date=today, attendance_type='entrada').count()
-        llegadas_tarde = Attendance.query.filter_by(date=today, attendance_type='entrada', is_late=True).count()
-        porcentaje_asistencia = 0
-        if total_empleados > 0:
-            porcentaje_asistencia = round((total_asistencias / total_empleados) * 100, 2)
-        return render_template('admin_dashboard.html',
-            total_empleados=total_empleados,
-            total_asistencias=total_asistencias,
-            llegadas_tarde=llegadas_tarde,
-            porcentaje_asistencia=porcentaje_asistencia)
+        return render_admin_dashboard()
     else:
         return redirect(url_for('scanner'))
+
 @app.route("/register_attendance", methods=["POST"])
+@rate_limited(scan_limiter, key_func=scan_client)
 def register_attendance():
     try:
         data = request.get_json()
         employee_id = data.get('employee_id')
-        latitude = data.get('latitude')
-        longitude = data.get('longitude')
+        latitude = parse_coordinate(data.get('latitude'))
+        longitude = parse_coordinate(data.get('longitude'))
         address = data.get('address')
+        address = address[:255] if isinstance(address, str) and address else None
         if not employee_id:
             return jsonify({'success': False, 'message': 'ID de empleado requerido'})
-        employee = Employee.query.filter_by(employee_id=employee_id, is_active=True).first()
-        if not employee:
-            return jsonify({'success': False, 'message': f'Empleado {employee_id} no encontrado o inactivo'})
-        today = date.today()
-        entradas_hoy = Attendance.query.filter_by(employee_id=employee_id, date=today, attendance_type='entrada').count()
-        salidas_hoy = Attendance.query.filter_by(employee_id=employee_id, date=today, attendance_type='salida').count()
-        ahora = datetime.now()
-        from models import WorkSchedule
-        dia_semana = ahora.weekday()
-        ws = WorkSchedule.query.filter_by(employee_id=employee_id, day_of_week=dia_semana, is_active=True).first()
-        if ws:
-            hora_entrada_permitida = ahora.replace(hour=ws.start_time.hour, minute=ws.start_time.minute, second=0, microsecond=0)
-        else:
-            hora_entrada_permitida = ahora.replace(hour=8, minute=0, second=0, microsecond=0)
-        if entradas_hoy == 0:
-            if ahora < hora_entrada_permitida:
-                return jsonify({'success': False, 'message': f'No se puede marcar asistencia antes de la hora permitida ({hora_entrada_permitida.strftime("%H:%M")}).'})
-            attendance_type = 'entrada'
-            is_late = ahora > hora_entrada_permitida
-            new_attendance = Attendance(
-                employee_id=employee_id,
-                attendance_type=attendance_type,
-                timestamp=ahora,
-                date=today,
-                is_late=is_late,
-                latitude=latitude,
-                longitude=longitude,
-                address=address
-            )
-            db.session.add(new_attendance)
-            db.session.commit()
-            return jsonify({
-                'success': True,
-                'message': '¡Se registró tu asistencia correctamente!',
-                'is_late': is_late,
-                'attendance_type': attendance_type
-            })
-        elif entradas_hoy == 1 and salidas_hoy == 0:
-            attendance_type = 'salida'
-            is_late = False
-            new_attendance = Attendance(
-                employee_id=employee_id,
-                attendance_type=attendance_type,
-                timestamp=ahora,
-                date=today,
-                is_late=is_late,
-                latitude=latitude,
-                longitude=longitude,
-                address=address
-            )
-            db.session.add(new_attendance)
-            db.session.commit()
-            return jsonify({
-                'success': True,
-                'message': '¡Se registró tu salida correctamente!',
-                'is_late': is_late,
-                'attendance_type': attendance_type
-            })
-        else:
-            return jsonify({'success': False, 'message': 'No puedes volver a marcar otra vez asistencia porque ya se marcó para hoy.'})
+        # Empleado, registros de hoy y horario en una sola consulta, guardado en el commit agrupado
+        result = attendance_writer.execute(record_scan, employee_id, datetime.now(),
+                                           latitude=latitude, longitude=longitude, address=address)
+        return jsonify(result)
+    except WriterBusyError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error interno: {str(e)}'})
-    
-    if error:
-        flash(error, 'error')
-        return render_template("reports.html", 
-                             today=today.strftime('%Y-%m-%d'),
-                             week_ago=week_ago.strftime('%Y-%m-%d'),
-                             employees=employees)
-    
-    return render_template("reports.html",
-                         today=today.strftime('%Y-%m-%d'),
-                         week_ago=week_ago.strftime('%Y-%m-%d'),
-                         employees=employees,
-                         report_data=report_data,
-                         report_title=f"Reporte Diario - {report_date.strftime('%d/%m/%Y')}",
-                         start_date=report_date.strftime('%Y-%m-%d'),
-                         end_date=report_date.strftime('%Y-%m-%d'))
+
+@app.route("/register_attendance/batch", methods=["POST"])
+@rate_limited(scan_limiter, key_func=scan_client, cost_func=batch_scan_count)
+def register_attendance_batch():
+    """
+    Recibe los escaneos que un kiosco acumuló sin conexión: {"scans": [{"idempotency_key",
+    "employee_id", "timestamp", "queued", "latitude", "longitude", "address"}, ...]}.
+    Todo el lote se guarda en una transacción; reenviar el mismo lote es seguro.
+    Se registran con la hora del servidor, salvo los escaneos en cola ("queued") de un
+    kiosco autenticado, que conservan la hora en que se hicieron.
+    """
+    data = request.get_json(silent=True) or {}
+    scans = data.get('scans')
+    if not isinstance(scans, list) or not scans:
+        return jsonify({'success': False, 'message': 'Se requiere una lista de escaneos'}), 400
+    if len(scans) > MAX_BATCH_SCANS:
+        return jsonify({'success': False, 'message': f'Máximo {MAX_BATCH_SCANS} escaneos por envío'}), 400
+    try:
+        results = attendance_writer.execute(register_scan_batch, scans, datetime.now(), trusted_clock=kiosk_id() is not None)
+    except WriterBusyError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    except IntegrityError:
+        # Otro envío con las mismas claves se guardó al mismo tiempo: al reintentar se obtienen sus resultados
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Escaneos enviados en paralelo; reintente'}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error interno: {str(e)}'}), 500
+    if random.randrange(SCAN_PURGE_EVERY) == 0:
+        # En el escritor, sin esperar: la respuesta no depende de la limpieza
+        attendance_writer.submit(purge_scan_ingestions)
+    return jsonify({'success': True, 'results': results})
+
+def stream_report(**context):
+    """
+    Envía reports.html por partes (stream_template), así el navegador muestra el
+    encabezado y la tabla mientras se genera el resto. Los mensajes flash se leen antes:
+    una vez enviados los encabezados la sesión ya no se puede actualizar.
+    """
+    get_flashed_messages()
+    return stream_template("reports.html", export_poll_ms=EXPORT_JOB_POLL_MS, **context)
 
 @app.route("/daily_report", methods=["POST"])
 def daily_report():
     report_date = datetime.strptime(request.form['report_date'], '%Y-%m-%d').date()
-    from reports import get_attendance_data, summarize_hours_worked
-    df = get_attendance_data(start_date=report_date, end_date=report_date)
-    summary = summarize_hours_worked(df)
+    page = request.form.get('page', 1, type=int)
+    from reports import get_daily_summary, paginate_report
+    summary = get_daily_summary(report_date)
     today = date.today()
     week_ago = today - timedelta(days=7)
-    employees = Employee.query.filter_by(is_active=True).all()
-    return render_template("reports.html",
+    employees = get_active_roster()
+    return stream_report(
         today=today.strftime('%Y-%m-%d'),
         week_ago=week_ago.strftime('%Y-%m-%d'),
         employees=employees,
-        report_data=summary,
+        report_page=paginate_report(summary, page) if not summary.empty else None,
+        report_params={'report_date': report_date.strftime('%Y-%m-%d')},
         report_title=f"Reporte Diario - {report_date.strftime('%d/%m/%Y')}",
         start_date=report_date.strftime('%Y-%m-%d'),
         end_date=report_date.strftime('%Y-%m-%d'),
@@ -363,33 +381,32 @@ def daily_report():
 def period_report():
     start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
     end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
+    # Los dos gráficos salen de la caché de reportes (el reporte de período no muestra tabla)
+    from reports import get_period_charts
+    period_charts = get_period_charts(start_date, end_date)
     charts = []
-    attendance_chart = generate_attendance_chart(start_date, end_date)
+    attendance_chart = period_charts['asistencia']
     if attendance_chart:
-        chart_data = base64.b64encode(attendance_chart.getvalue()).decode()
+        chart_data = base64.b64encode(attendance_chart).decode()
         charts.append({
             'title': 'Asistencia por Día',
             'data': chart_data
         })
-    dept_chart = generate_department_chart(start_date, end_date)
+    dept_chart = period_charts['departamento']
     if dept_chart:
-        chart_data = base64.b64encode(dept_chart.getvalue()).decode()
+        chart_data = base64.b64encode(dept_chart).decode()
         charts.append({
             'title': 'Empleados por Departamento',
             'data': chart_data
         })
-    from reports import get_attendance_data, summarize_hours_worked
-    df = get_attendance_data(start_date=start_date, end_date=end_date)
-    summary = summarize_hours_worked(df)
     today = date.today()
     week_ago = today - timedelta(days=7)
-    employees = Employee.query.filter_by(is_active=True).all()
-    return render_template("reports.html",
+    employees = get_active_roster()
+    return stream_report(
         today=today.strftime('%Y-%m-%d'),
         week_ago=week_ago.strftime('%Y-%m-%d'),
         employees=employees,
         charts=charts,
-        report_data=summary,
         report_title=f"Reporte de Período - {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}",
         start_date=start_date.strftime('%Y-%m-%d'),
         end_date=end_date.strftime('%Y-%m-%d'),
@@ -400,16 +417,17 @@ def employee_report():
     employee_id = request.form['employee_id']
     start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
     end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
+    page = request.form.get('page', 1, type=int)
     
-    from reports import generate_individual_report
-    summary, error = generate_individual_report(start_date, end_date, employee_id)
+    from reports import get_summary_report_page
+    report_page = get_summary_report_page(start_date, end_date, employee_id, page)
     
     today = date.today()
     week_ago = today - timedelta(days=7)
-    employees = Employee.query.filter_by(is_active=True).all()
+    employees = get_active_roster()
     
-    if error:
-        flash(error, 'error')
+    if report_page is None:
+        flash(f"No hay datos de asistencia para el empleado {employee_id} en el período seleccionado.", 'error')
         return render_template("reports.html", 
                              today=today.strftime('%Y-%m-%d'),
                              week_ago=week_ago.strftime('%Y-%m-%d'),
@@ -421,11 +439,13 @@ def employee_report():
     start_date_formatted = start_date.strftime('%d/%m/%Y')
     end_date_formatted = end_date.strftime('%d/%m/%Y')
     
-    return render_template("reports.html",
+    return stream_report(
                          today=today.strftime('%Y-%m-%d'),
                          week_ago=week_ago.strftime('%Y-%m-%d'),
                          employees=employees,
-                         report_data=summary,
+                         report_page=report_page,
+                         report_params={'employee_id': employee_id, 'start_date': start_date.strftime('%Y-%m-%d'),
+                                        'end_date': end_date.strftime('%Y-%m-%d')},
                          report_title=f"Reporte Individual - {employee_name} - {start_date_formatted} - {end_date_formatted}",
                          start_date=start_date.strftime('%Y-%m-%d'),
                          end_date=end_date.strftime('%Y-%m-%d'),
@@ -437,16 +457,17 @@ def employee_report():
 def general_report():
     start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
     end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
+    page = request.form.get('page', 1, type=int)
     
-    from reports import generate_general_detailed_report
-    summary, error = generate_general_detailed_report(start_date, end_date)
+    from reports import get_summary_report_page
+    report_page = get_summary_report_page(start_date, end_date, page=page)
     
     today = date.today()
     week_ago = today - timedelta(days=7)
-    employees = Employee.query.filter_by(is_active=True).all()
+    employees = get_active_roster()
     
-    if error:
-        flash(error, 'error')
+    if report_page is None:
+        flash("No hay datos de asistencia en el período seleccionado.", 'error')
         return render_template("reports.html", 
                              today=today.strftime('%Y-%m-%d'),
                              week_ago=week_ago.strftime('%Y-%m-%d'),
@@ -456,19 +477,55 @@ def general_report():
     start_date_formatted = start_date.strftime('%d/%m/%Y')
     end_date_formatted = end_date.strftime('%d/%m/%Y')
     
-    return render_template("reports.html",
+    return stream_report(
                          today=today.strftime('%Y-%m-%d'),
                          week_ago=week_ago.strftime('%Y-%m-%d'),
                          employees=employees,
-                         report_data=summary,
+                         report_page=report_page,
+                         report_params={'start_date': start_date.strftime('%Y-%m-%d'),
+                                        'end_date': end_date.strftime('%Y-%m-%d')},
                          report_title=f"Reporte General - {start_date_formatted} - {end_date_formatted}",
                          start_date=start_date.strftime('%Y-%m-%d'),
                          end_date=end_date.strftime('%Y-%m-%d'),
                          csrf_token=generate_csrf_token())
 
+# Un año: la URL del QR incluye la versión de su contenido (ver qr_url)
+QR_MAX_AGE = 365 * 24 * 3600
+
+@app.template_global()
+def qr_url(employee_id, fmt='png', tier=QR_DEFAULT_TIER):
+    """URL del QR de un empleado; cambia si cambia el contenido, así se puede cachear sin vencimiento."""
+    return url_for('employee_qr', employee_id=employee_id, format=fmt, size=tier,
+                   v=qr_content_hash(employee_id, fmt, tier)[:12])
+
+@app.route("/qr/<employee_id>")
+def employee_qr(employee_id):
+    """
+    Sirve el QR de un empleado generado bajo demanda (sin archivos en disco).
+    Parámetros: format=png|svg, size=thumbnail|screen|print.
+    Responde 304 si el navegador ya tiene la misma versión (If-None-Match).
+    """
+    fmt = request.args.get('format', 'png')
+    tier = request.args.get('size', QR_DEFAULT_TIER)
+    if not validate_employee_id(employee_id):
+        return jsonify({'success': False, 'message': 'ID de empleado inválido'}), 400
+    if fmt not in QR_FORMATS or tier not in QR_TIERS:
+        return jsonify({'success': False, 'message': f"Parámetros inválidos: format={'|'.join(QR_FORMATS)}, size={'|'.join(QR_TIERS)}"}), 400
+    etag = qr_content_hash(employee_id, fmt, tier)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        if not db.session.execute(db.select(Employee.id).where(Employee.employee_id == employee_id)).first():
+            return jsonify({'success': False, 'message': 'Empleado no encontrado'}), 404
+        image, etag = get_qr_image(employee_id, fmt, tier)
+        response = Response(image, mimetype=QR_FORMATS[fmt])
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={QR_MAX_AGE}, immutable'
+    return response
+
 @app.route("/employees")
 def employees():
-    employees = Employee.query.filter_by(is_active=True).all()
+    employees = get_active_roster()
     return render_template("employees.html", employees=employees)
 
 # Editar empleado
@@ -503,6 +560,7 @@ def edit_employee(employee_id):
                 ws.end_time = datetime.datetime.strptime(end_time, "%H:%M").time()
             db.session.commit()
 
+        increment(EMPLOYEE_EDITS)
         db.session.commit()
         flash("Empleado actualizado correctamente.")
         return redirect(url_for("employees"))
@@ -516,6 +574,9 @@ def edit_employee(employee_id):
 # Eliminar empleado
 def delete_employee(employee_id):
     employee = Employee.query.filter_by(employee_id=employee_id).first_or_404()
+    if employee.is_active:
+        increment(ACTIVE_EMPLOYEES, -1)
+    increment(EMPLOYEE_EDITS)
     db.session.delete(employee)
     db.session.commit()
     flash("Empleado eliminado correctamente.")
@@ -527,20 +588,67 @@ app.add_url_rule("/employees/delete/<employee_id>", view_func=delete_employee, m
 
 @app.route('/scanner')
 def scanner():
-    today = date.today()
-    today_attendances = Attendance.query.filter_by(date=today).order_by(Attendance.timestamp.desc()).all()
-    return render_template('scanner.html', today_attendances=today_attendances)
+    # Los registros del día los carga la página desde /scanner/feed
+    return render_template('scanner.html', feed_poll_ms=SCANNER_FEED_POLL_MS)
+
+@app.route('/scanner/kiosk', methods=['GET', 'POST', 'DELETE'])
+def kiosk_setup():
+    """
+    Configuración del kiosco. El token nunca va en la URL: la página lo envía en la
+    cabecera X-Kiosk-Token para validarlo y, si es válido, lo guarda en el navegador.
+    El POST también deja la cookie con la que el kiosco se suscribe a /events (el
+    escáner lo repite al cargar); DELETE la borra.
+    """
+    if request.method == 'DELETE':
+        response = jsonify({'success': True})
+        response.delete_cookie(KIOSK_COOKIE, path='/events')
+        return response
+    if request.method == 'POST':
+        # Los tokens inválidos cuentan como intentos de inicio de sesión fallidos (fuerza bruta)
+        ip_address = client_ip()
+        if is_rate_limited(ip_address):
+            return jsonify({'success': False, 'message': 'Demasiados intentos. Intente de nuevo más tarde.'}), 429
+        if kiosk_id() is None:
+            add_login_attempt(ip_address)
+            return jsonify({'success': False, 'message': 'Token de kiosco inválido'}), 403
+        response = jsonify({'success': True})
+        response.set_cookie(KIOSK_COOKIE, request.headers['X-Kiosk-Token'], max_age=KIOSK_COOKIE_MAX_AGE,
+                            path='/events', httponly=True, samesite='Strict',
+                            secure=app.config['SESSION_COOKIE_SECURE'])
+        return response
+    return render_template('kiosk_setup.html')
+
+@app.route('/events')
+def events_stream():
+    """Eventos de asistencia en vivo (SSE) para el dashboard (sesión admin) y los kioscos autenticados."""
+    if not session.get('admin_user_id') and kiosk_id() is None and kiosk_id(request.cookies.get(KIOSK_COOKIE, '')) is None:
+        return jsonify({'success': False, 'message': 'No autorizado'}), 401
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    response = event_stream_response(event_broker, last_event_id, max_subscribers=app.config['EVENT_MAX_SUBSCRIBERS'])
+    if response is None:
+        # Las páginas siguen con su consulta periódica y EventSource reintenta más tarde
+        response = jsonify({'success': False, 'message': 'Demasiadas conexiones en vivo'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+    return response
+
+@app.route('/scanner/feed')
+def scanner_feed():
+    """Registros de hoy con id mayor a ?after= (sin él, los más recientes), como JSON."""
+    after_id = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    return jsonify(get_feed(date.today(), after_id, limit))
 
 @app.route('/reports', methods=['GET'])
 def reports():
     today = date.today()
     week_ago = today - timedelta(days=7)
-    employees = Employee.query.filter_by(is_active=True).all()
+    employees = get_active_roster()
     return render_template("reports.html",
         today=today.strftime('%Y-%m-%d'),
         week_ago=week_ago.strftime('%Y-%m-%d'),
         employees=employees,
-        report_data=None,
+        report_page=None,
         csrf_token=generate_csrf_token())
 
 @app.route('/employees/add', methods=['GET', 'POST'])
@@ -601,10 +709,6 @@ def add_employee():
             return render_template('add_employees.html')
         
         try:
-            # Generar QR automáticamente
-            from qr_generator import generate_qr_code
-            qr_path = generate_qr_code(employee_id, employee_id)
-
             new_employee = Employee(
                 employee_id=employee_id,
                 name=name,
@@ -613,12 +717,13 @@ def add_employee():
                 position=position,
                 email=email,
                 phone=phone,
-                is_active=True,
-                qr_code=qr_path
+                is_active=True
             )
             db.session.add(new_employee)
+            increment(ACTIVE_EMPLOYEES)
+            increment(EMPLOYEE_EDITS)
             db.session.commit()
-            flash('Empleado agregado correctamente y QR generado.', 'success')
+            flash('Empleado agregado correctamente. Su código QR está disponible en la lista de empleados.', 'success')
             return redirect(url_for('employees'))
         except Exception as e:
             db.session.rollback()
@@ -627,109 +732,144 @@ def add_employee():
     
     return render_template('add_employees.html')
 
+@app.route('/employees/import', methods=['GET', 'POST'])
+@admin_login_required
+def import_employees():
+    """Alta masiva de empleados desde un archivo CSV o Excel, con reporte de errores por fila."""
+    if request.method == 'POST':
+        if not validate_csrf_token(request.form.get('csrf_token')):
+            flash('Token de seguridad inválido.', 'danger')
+            return render_template('import_employees.html')
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Seleccione un archivo para importar.', 'danger')
+            return render_template('import_employees.html')
+
+        from employee_import import import_employees as run_import
+        result, error = run_import(upload.stream, secure_filename(upload.filename))
+        if error:
+            flash(error, 'danger')
+            return render_template('import_employees.html')
+        flash(f"Se importaron {result['importados']} de {result['total']} empleados.",
+              'success' if not result['errores'] else 'warning')
+        return render_template('import_employees.html', result=result)
+
+    return render_template('import_employees.html')
+
 @app.route("/export_pdf", methods=["POST"])
 def export_pdf():
     start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
     end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
     employee_id = request.form.get('employee_id')
-    
-    if employee_id:
-        # Para reporte individual, usar listado completo
-        from reports import generate_individual_report
-        summary, error = generate_individual_report(start_date, end_date, employee_id)
-    else:
-        # Para reporte general, usar listado detallado de todos los empleados
-        from reports import generate_general_detailed_report
-        summary, error = generate_general_detailed_report(start_date, end_date)
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch, cm
-    import io
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=20, leftMargin=20, topMargin=20, bottomMargin=20)
-    elements = []
-    styles = getSampleStyleSheet()
-    small_style = ParagraphStyle('small', parent=styles['Normal'], fontSize=6, leading=7)
-    dir_style = ParagraphStyle('dir', parent=small_style, wordWrap='CJK', leading=7, fontSize=6, alignment=0, leftIndent=2, rightIndent=2, spaceBefore=2, spaceAfter=2)
-    elements.append(Paragraph("Reporte de Asistencia", styles['Title']))
-    
-    # Agregar subtítulo con empleado y fechas si es reporte individual
+
+    employee_name = None
     if employee_id:
         employee = Employee.query.filter_by(employee_id=employee_id).first()
-        if employee:
-            start_date_formatted = start_date.strftime('%d/%m/%Y')
-            end_date_formatted = end_date.strftime('%d/%m/%Y')
-            subtitle = f"{employee.full_name} - {start_date_formatted} - {end_date_formatted}"
-            elements.append(Paragraph(subtitle, styles['Heading2']))
-    else:
-        # Para reportes generales, solo mostrar el rango de fechas
-        start_date_formatted = start_date.strftime('%d/%m/%Y')
-        end_date_formatted = end_date.strftime('%d/%m/%Y')
-        subtitle = f"Período: {start_date_formatted} - {end_date_formatted}"
-        elements.append(Paragraph(subtitle, styles['Heading3']))
-    
-    elements.append(Spacer(1, 12))
-    if summary is not None and not summary.empty:
-        # Filtrar la columna attendance_id para el PDF
-        summary_pdf = summary.copy()
-        if 'attendance_id' in summary_pdf.columns:
-            summary_pdf = summary_pdf.drop(['attendance_id'], axis=1)
-        
-        data = [summary_pdf.columns.tolist()] + summary_pdf.values.tolist()
-        # Cambiar cabecera 'Horas Trabajadas' por dos líneas
-        if 'Horas Trabajadas' in data[0]:
-            idx = data[0].index('Horas Trabajadas')
-            data[0][idx] = 'Horas\nTrabajadas'
-        # Detectar columna dirección y horas
-        direccion_idx = None
-        for i, col in enumerate(data[0]):
-            if 'direc' in col.lower():
-                direccion_idx = i
-        col_count = len(data[0])
-        table_width = 7.2 * inch
-        min_col_width = 1.2 * cm
-        # Asignar ancho fijo grande a dirección
-        if direccion_idx is not None:
-            dir_col_width = 5.0 * cm
-            other_col_width = (table_width - dir_col_width) / (col_count - 1)
-            col_widths = [dir_col_width if i == direccion_idx else other_col_width for i in range(col_count)]
-        else:
-            col_width = max(table_width / col_count, min_col_width)
-            col_widths = [col_width] * col_count
-        max_chars = [int(w // 4) for w in col_widths]
-        def format_cell(val, i):
-            s = str(val)
-            if direccion_idx is not None and i == direccion_idx:
-                max_len = 120
-                s = s[:max_len] + ('...' if len(s) > max_len else '')
-                return Paragraph(s.replace('\n', '<br/>'), dir_style)
-            return s if len(s) <= max_chars[i] else s[:max_chars[i]-3] + '...'
-        data_out = [data[0]]
-        for row in data[1:]:
-            data_out.append([format_cell(cell, i) for i, cell in enumerate(row)])
-        table = Table(data_out, colWidths=col_widths, hAlign='CENTER')
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        elements.append(table)
-    else:
-        elements.append(Paragraph("No hay datos para el período seleccionado.", styles['Normal']))
-    doc.build(elements)
+        employee_name = employee.full_name if employee else None
+
+    # En memoria hasta 10 MB; si el PDF crece pasa a un archivo temporal que se borra al cerrar
+    from exports import write_pdf_report
+    buffer = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+    try:
+        write_pdf_report(buffer, start_date, end_date, employee_id=employee_id, employee_name=employee_name)
+    except Exception:
+        buffer.close()
+        raise
     buffer.seek(0)
     return send_file(buffer, as_attachment=True, download_name="reporte_asistencia.pdf", mimetype='application/pdf')
 
+def export_job_response(job, status_code=200):
+    status = export_jobs.status(job)
+    status['status_url'] = url_for('export_job_status', token=job.token)
+    if status['status'] == EXPORT_DONE:
+        status['download_url'] = url_for('export_job_download', token=job.token)
+    response = jsonify({'success': True, 'job': status})
+    response.status_code = status_code
+    return response
+
+@app.route("/export_jobs", methods=["POST"])
+def create_export_job():
+    """
+    Encola una exportación PDF o Excel y responde enseguida con el estado del trabajo.
+    Campos: format=pdf|excel, start_date, end_date, employee_id (opcional), csrf_token.
+    Si ya hay una exportación igual en curso o terminada se devuelve esa.
+    """
+    if not validate_csrf_token(request.form.get('csrf_token')):
+        return jsonify({'success': False, 'message': 'Token de seguridad inválido'}), 400
+    export_format = request.form.get('format')
+    employee_id = request.form.get('employee_id') or None
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'Formato inválido: format=pdf|excel'}), 400
+    if employee_id and not validate_employee_id(employee_id):
+        return jsonify({'success': False, 'message': 'ID de empleado inválido'}), 400
+    try:
+        start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'message': 'Formato de fecha inválido. Use AAAA-MM-DD'}), 400
+    if start_date > end_date:
+        return jsonify({'success': False, 'message': 'La fecha inicial es posterior a la final'}), 400
+
+    job = export_jobs.submit(export_format, start_date, end_date, employee_id)
+    response = export_job_response(job, 200 if job.status == EXPORT_DONE else 202)
+    response.headers['Location'] = url_for('export_job_status', token=job.token)
+    return response
+
+@app.route("/export_jobs/<token>")
+def export_job_status(token):
+    from models import ExportJob
+    job = ExportJob.query.filter_by(token=token).first()
+    if job is None:
+        return jsonify({'success': False, 'message': 'Exportación no encontrada o vencida'}), 404
+    return export_job_response(job)
+
+@app.route("/export_jobs/<token>/download")
+def export_job_download(token):
+    from models import ExportJob
+    job = ExportJob.query.filter_by(token=token).first()
+    if job is None or job.status != EXPORT_DONE or job.expires_at < datetime.utcnow() or not os.path.exists(job.file_path):
+        return jsonify({'success': False, 'message': 'Exportación no disponible'}), 404
+    export = EXPORT_FORMATS[job.export_format]
+    return send_file(job.file_path, as_attachment=True, download_name=export.download_name, mimetype=export.mimetype)
+
+@app.route("/export_stream", methods=["GET"])
+@admin_login_required
+def export_stream():
+    """
+    Exporta asistencias como CSV o NDJSON en streaming, para integraciones (ej. nómina).
+    Parámetros: start_date, end_date, employee_id (opcionales), format=csv|ndjson, mode=raw|summary.
+    """
+    from exports import RAW_COLUMNS, REPORT_COLUMNS, iter_raw_rows, iter_summary_rows, stream_csv, stream_ndjson
+    export_format = request.args.get('format', 'csv')
+    mode = request.args.get('mode', 'raw')
+    employee_id = request.args.get('employee_id') or None
+    if export_format not in ('csv', 'ndjson') or mode not in ('raw', 'summary'):
+        return jsonify({'success': False, 'message': 'Parámetros inválidos: format=csv|ndjson, mode=raw|summary'}), 400
+    if employee_id and not validate_employee_id(employee_id):
+        return jsonify({'success': False, 'message': 'ID de empleado inválido'}), 400
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Formato de fecha inválido. Use AAAA-MM-DD'}), 400
+
+    if mode == 'raw':
+        columns = RAW_COLUMNS
+        batches = iter_raw_rows(start_date, end_date, employee_id)
+    else:
+        if not start_date or not end_date:
+            return jsonify({'success': False, 'message': 'El modo summary requiere start_date y end_date'}), 400
+        columns = REPORT_COLUMNS
+        batches = iter_summary_rows(start_date, end_date, employee_id)
+
+    if export_format == 'csv':
+        body, mimetype, extension = stream_csv(columns, batches), 'text/csv', 'csv'
+    else:
+        body, mimetype, extension = stream_ndjson(columns, batches), 'application/x-ndjson', 'ndjson'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=asistencia_{mode}.{extension}'
+    return response
+
 @app.route('/add_admin', methods=['POST'])
 @admin_login_required
 def add_admin():
@@ -793,6 +933,15 @@ def update_attendance_time():
         updated_timestamp = datetime.combine(attendance.timestamp.date(), new_time_obj)
         
         attendance.timestamp = updated_timestamp
+        refresh_daily_summary(attendance.employee_id, attendance.date)
+        increment(ATTENDANCE_EDITS)
+        touch_date(attendance.date)
+        queue_event(db.session, 'edicion', {
+            'id': attendance.id,
+            'employee_id': attendance.employee_id,
+            'date': attendance.date.isoformat(),
+            'time': updated_timestamp.strftime('%H:%M:%S'),
+        })
         db.session.commit()
         
         return jsonify({
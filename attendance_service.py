@@ -0,0 +1,258 @@
+"""
+Registro de asistencia a partir de un escaneo de QR.
+
+Reúne en un solo lugar las reglas de negocio del escaneo (hora mínima permitida,
+llegada tarde, una entrada y una salida por día) para que cualquier ruta que
+registre asistencias las aplique igual.
+"""
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from models import db, Employee, Attendance, WorkSchedule, ScanIngestion
+from counters import track_attendance
+from daily_summary import refresh_daily_summary
+from events import queue_event
+from geocoding import queue_geocode
+from scanner_feed import feed_item
+
+# Hora de entrada cuando el empleado no tiene horario activo para ese día
+DEFAULT_START_TIME = time(8, 0)
+
+# Escaneos por envío en /register_attendance/batch
+MAX_BATCH_SCANS = 500
+# Tolerancia para relojes de kiosco adelantados y antigüedad máxima de un escaneo en cola
+CLIENT_CLOCK_SKEW = timedelta(minutes=5)
+MAX_SCAN_AGE = timedelta(days=7)
+# Tiempo que se guardan los resultados por clave de idempotencia. Supera MAX_SCAN_AGE:
+# un reenvío de una clave ya borrada se rechaza por antigüedad y no se registra dos veces.
+SCAN_INGESTION_RETENTION = MAX_SCAN_AGE + timedelta(days=1)
+# Filas borradas por cada limpieza de ScanIngestion
+SCAN_PURGE_LIMIT = 1000
+
+ScanState = namedtuple('ScanState', ['employee_id', 'entradas', 'salidas', 'start_time', 'full_name', 'department'])
+
+
+def scan_state_select(employee_id, ahora):
+    """
+    Consulta única con el empleado activo, sus entradas y salidas del día y la hora
+    de entrada de su horario para ese día de la semana.
+    """
+    today = ahora.date()
+
+    def count_today(attendance_type):
+        return db.select(db.func.count(Attendance.id)).where(
+            Attendance.employee_id == Employee.employee_id,
+            Attendance.date == today,
+            Attendance.attendance_type == attendance_type,
+        ).scalar_subquery()
+
+    start_time = db.select(WorkSchedule.start_time).where(
+        WorkSchedule.employee_id == Employee.employee_id,
+        WorkSchedule.day_of_week == ahora.weekday(),
+        WorkSchedule.is_active == True,
+    ).limit(1).scalar_subquery()
+
+    return db.select(Employee.employee_id, count_today('entrada'), count_today('salida'), start_time,
+                     Employee.name, Employee.last_name, Employee.department).where(
+        Employee.employee_id == employee_id, Employee.is_active == True)
+
+
+def get_scan_state(employee_id, ahora):
+    """
+    Obtiene el estado del empleado para un escaneo en un solo viaje a la base de datos.
+    Devuelve None si el empleado no existe o está inactivo.
+    """
+    row = db.session.execute(scan_state_select(employee_id, ahora)).first()
+    if row is None:
+        return None
+    employee_id, entradas, salidas, start_time, name, last_name, department = row
+    return ScanState(employee_id, entradas, salidas, start_time, f"{name} {last_name}", department)
+
+
+def evaluate_scan(state, ahora):
+    """
+    Aplica las reglas de negocio a un escaneo.
+    Devuelve (attendance_type, is_late, None) si se debe registrar, o (None, False, mensaje) si no.
+    """
+    start_time = state.start_time or DEFAULT_START_TIME
+    hora_entrada_permitida = ahora.replace(hour=start_time.hour, minute=start_time.minute, second=0, microsecond=0)
+    if state.entradas == 0:
+        if ahora < hora_entrada_permitida:
+            return None, False, f'No se puede marcar asistencia antes de la hora permitida ({hora_entrada_permitida.strftime("%H:%M")}).'
+        return 'entrada', ahora > hora_entrada_permitida, None
+    if state.entradas == 1 and state.salidas == 0:
+        return 'salida', False, None
+    return None, False, 'No puedes volver a marcar otra vez asistencia porque ya se marcó para hoy.'
+
+
+def register_scan(employee_id, ahora, latitude=None, longitude=None, address=None):
+    """
+    Valida y agrega a la sesión el registro de un escaneo. No hace commit.
+    Devuelve (resultado, asistencia), donde resultado es el diccionario que se responde
+    al cliente y asistencia es el nuevo registro (None si se rechazó).
+    """
+    state = get_scan_state(employee_id, ahora)
+    if state is None:
+        return {'success': False, 'message': f'Empleado {employee_id} no encontrado o inactivo'}, None
+
+    attendance_type, is_late, error = evaluate_scan(state, ahora)
+    if error:
+        return {'success': False, 'message': error}, None
+
+    new_attendance = Attendance(
+        employee_id=employee_id,
+        attendance_type=attendance_type,
+        timestamp=ahora,
+        date=ahora.date(),
+        is_late=is_late,
+        latitude=latitude,
+        longitude=longitude,
+        address=address
+    )
+    db.session.add(new_attendance)
+    track_attendance(new_attendance)
+    refresh_daily_summary(employee_id, new_attendance.date)
+    # La consulta del resumen ya hizo flush, así el registro tiene id para el evento
+    queue_event(db.session, 'asistencia', dict(
+        feed_item(new_attendance.id, employee_id, state.full_name, state.department, attendance_type, is_late, ahora),
+        date=ahora.date().isoformat()))
+    if address is None and latitude is not None and longitude is not None:
+        # Si el kiosco envió solo coordenadas, la dirección se completa después del commit
+        queue_geocode(db.session, new_attendance.id)
+    message = '¡Se registró tu asistencia correctamente!' if attendance_type == 'entrada' else '¡Se registró tu salida correctamente!'
+    return {
+        'success': True,
+        'message': message,
+        'is_late': is_late,
+        'attendance_type': attendance_type
+    }, new_attendance
+
+
+def record_scan(employee_id, ahora, latitude=None, longitude=None, address=None):
+    """register_scan para el escritor de commit agrupado: devuelve solo el resultado."""
+    result, _ = register_scan(employee_id, ahora, latitude=latitude, longitude=longitude, address=address)
+    return result
+
+
+def parse_client_timestamp(value):
+    """
+    Convierte la hora ISO 8601 enviada por el kiosco a la hora local sin zona del servidor.
+    Devuelve None si no es válida.
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_coordinate(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _validate_batch_scan(scan, now, trusted_clock):
+    """
+    Devuelve (clave, employee_id, hora del kiosco, hora a registrar, None) o
+    (clave, None, None, None, mensaje de error).
+
+    La hora del kiosco solo se usa para los escaneos que quedaron en cola sin conexión
+    ('queued') y si el kiosco está autenticado (trusted_clock); el resto se registra con
+    la hora del servidor, así nadie puede adelantar o atrasar una marca desde el cliente.
+    """
+    if not isinstance(scan, dict):
+        return None, None, None, None, 'Escaneo inválido'
+    key = scan.get('idempotency_key')
+    if not isinstance(key, str) or not 0 < len(key) <= 64:
+        return None, None, None, None, 'Clave de idempotencia requerida (máximo 64 caracteres)'
+    employee_id = scan.get('employee_id')
+    if not isinstance(employee_id, str) or not employee_id:
+        return key, None, None, None, 'ID de empleado requerido'
+    timestamp = parse_client_timestamp(scan.get('timestamp'))
+    if timestamp is None:
+        return key, None, None, None, 'Hora del escaneo inválida (use ISO 8601)'
+    if timestamp > now + CLIENT_CLOCK_SKEW or timestamp < now - MAX_SCAN_AGE:
+        return key, None, None, None, 'Hora del escaneo fuera del rango permitido'
+    registered_at = timestamp if trusted_clock and scan.get('queued') is True else now
+    return key, employee_id, timestamp, registered_at, None
+
+
+def register_scan_batch(scans, now, trusted_clock=False):
+    """
+    Registra un lote de escaneos de un kiosco en la sesión actual, sin hacer commit
+    (el lote completo se confirma en una sola transacción). Con trusted_clock (kiosco
+    autenticado) los escaneos en cola se registran con la hora en que se hicieron.
+
+    Los escaneos se aplican en orden de hora con las mismas reglas que register_scan,
+    así una entrada y una salida del mismo lote se validan en el orden en que ocurrieron.
+    Cada escaneo trae una clave de idempotencia: si ya se procesó (en un envío anterior
+    o repetido en este lote) se devuelve el resultado guardado sin volver a registrarlo.
+    Devuelve un resultado por escaneo, en el orden recibido.
+    """
+    results = [None] * len(scans)
+    pending = []
+    for index, scan in enumerate(scans):
+        key, employee_id, timestamp, registered_at, error = _validate_batch_scan(scan, now, trusted_clock)
+        if error:
+            results[index] = {'idempotency_key': key, 'success': False, 'message': error}
+        else:
+            pending.append((index, key, employee_id, timestamp, registered_at, scan))
+
+    # Claves ya procesadas, en una sola consulta
+    keys = {item[1] for item in pending}
+    stored = {row.idempotency_key: row for row in db.session.execute(
+        db.select(ScanIngestion).where(ScanIngestion.idempotency_key.in_(keys))
+    ).scalars()} if keys else {}
+
+    to_apply, repeated = [], []
+    first_index = {}
+    for item in pending:
+        index, key = item[0], item[1]
+        if key in stored:
+            results[index] = dict(stored[key].to_result(), duplicate=True)
+        elif key in first_index:
+            repeated.append((index, first_index[key]))
+        else:
+            first_index[key] = index
+            to_apply.append(item)
+
+    for index, key, employee_id, timestamp, registered_at, scan in sorted(to_apply, key=lambda item: item[4]):
+        address = scan.get('address')
+        result, new_attendance = register_scan(
+            employee_id, registered_at,
+            latitude=parse_coordinate(scan.get('latitude')),
+            longitude=parse_coordinate(scan.get('longitude')),
+            address=address[:255] if isinstance(address, str) and address else None,
+        )
+        db.session.add(ScanIngestion(
+            idempotency_key=key,
+            employee_id=employee_id[:20],
+            client_timestamp=timestamp,
+            attendance=new_attendance,
+            success=result['success'],
+            message=result['message'][:255],
+            attendance_type=result.get('attendance_type'),
+            is_late=result.get('is_late', False),
+        ))
+        results[index] = dict(result, idempotency_key=key)
+
+    for index, original in repeated:
+        results[index] = dict(results[original], duplicate=True)
+    return results
+
+
+def purge_scan_ingestions(now=None, limit=SCAN_PURGE_LIMIT):
+    """
+    Borra hasta `limit` resultados de escaneos más antiguos que SCAN_INGESTION_RETENTION.
+    No hace commit. Devuelve cuántos borró.
+    """
+    cutoff = (now or datetime.utcnow()) - SCAN_INGESTION_RETENTION
+    oldest = db.select(ScanIngestion.id).where(ScanIngestion.created_at < cutoff).limit(limit)
+    deleted = db.session.execute(db.delete(ScanIngestion).where(ScanIngestion.id.in_(oldest.scalar_subquery())))
+    return deleted.rowcount
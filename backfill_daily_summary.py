@@ -0,0 +1,19 @@
+import sys
+from datetime import datetime
+
+from app import app
+from models import db
+from daily_summary import rebuild_daily_summaries
+
+# Script para reconstruir el resumen diario de asistencia desde los registros.
+# Uso: python backfill_daily_summary.py [fecha_inicio fecha_fin]  (fechas AAAA-MM-DD)
+
+def backfill_daily_summary(start_date=None, end_date=None):
+    with app.app_context():
+        created = rebuild_daily_summaries(start_date, end_date)
+        db.session.commit()
+        print(f"Resumen diario reconstruido ({created} filas de empleado-día).")
+
+if __name__ == "__main__":
+    dates = [datetime.strptime(arg, '%Y-%m-%d').date() for arg in sys.argv[1:3]]
+    backfill_daily_summary(*dates)
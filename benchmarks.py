@@ -0,0 +1,409 @@
+"""
+Mediciones de rendimiento del sistema de asistencia.
+
+Uso:
+    python benchmarks.py horas
+    python benchmarks.py planes
+    python benchmarks.py escaneo
+    python benchmarks.py escritura
+    python benchmarks.py eventos
+    python benchmarks.py pdf
+    python benchmarks.py qr
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, date, timedelta
+
+import pandas as pd
+
+
+def _synthetic_attendance(num_employees, num_days, seed=42):
+    """
+    Genera un DataFrame con la misma forma que get_attendance_data:
+    una entrada y (casi siempre) una salida por empleado y día.
+    """
+    rnd = random.Random(seed)
+    rows = []
+    attendance_id = 0
+    start = date(2025, 1, 1)
+    for day in range(num_days):
+        current_date = start + timedelta(days=day)
+        for emp in range(num_employees):
+            employee_id = f"EMP{emp:05d}"
+            entrada = datetime.combine(current_date, datetime.min.time()) + timedelta(
+                hours=7, minutes=rnd.randint(0, 120))
+            attendance_id += 1
+            rows.append((attendance_id, employee_id, f"Empleado {emp}", f"Depto {emp % 7}",
+                         current_date, entrada, 'entrada', 'Oficina central'))
+            if rnd.random() < 0.95:
+                attendance_id += 1
+                salida = entrada + timedelta(hours=8, minutes=rnd.randint(0, 90))
+                rows.append((attendance_id, employee_id, f"Empleado {emp}", f"Depto {emp % 7}",
+                             current_date, salida, 'salida', None))
+    columns = ['attendance_id', 'employee_id', 'employee_name', 'department',
+               'date', 'timestamp', 'attendance_type', 'address']
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def bench_hours(sizes=((250, 22), (500, 22), (1000, 22), (2000, 22), (4000, 22))):
+    """
+    Mide summarize_hours_worked con tamaños crecientes para comprobar que escala
+    linealmente con la cantidad de registros (el tiempo por registro debe ser estable).
+    """
+    from reports import summarize_hours_worked
+
+    print(f"{'empleados':>10} {'registros':>10} {'segundos':>10} {'us/registro':>12}")
+    for num_employees, num_days in sizes:
+        df = _synthetic_attendance(num_employees, num_days)
+        summarize_hours_worked(df.head(100))  # calentamiento
+        started = time.perf_counter()
+        summarize_hours_worked(df)
+        elapsed = time.perf_counter() - started
+        print(f"{num_employees:>10} {len(df):>10} {elapsed:>10.3f} {elapsed / len(df) * 1e6:>12.2f}")
+
+
+def _explain(engine, statement):
+    """Devuelve el plan de SQLite (EXPLAIN QUERY PLAN) de una sentencia SQLAlchemy."""
+    sql = str(statement.compile(engine, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans():
+    """
+    Verifica en una base SQLite temporal que las consultas del dashboard y del
+    escaneo usan los índices compuestos de Attendance, los reportes el índice del
+    resumen diario y el feed del escáner la clave primaria, sin recorrer toda la tabla.
+    """
+    from sqlalchemy import create_engine
+    from app import app
+    from models import db, Attendance
+    from attendance_service import scan_state_select
+    from reports import daily_summary_select
+    from scanner_feed import feed_select
+
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    today = date.today()
+
+    with app.app_context():
+        def count(query):
+            return db.select(db.func.count()).select_from(query.statement.subquery())
+
+        checks = {
+            'dashboard: asistencias de hoy': (
+                count(Attendance.query.filter_by(date=today, attendance_type='entrada')),
+                'ix_attendance_date_type_late'),
+            'dashboard: llegadas tarde': (
+                count(Attendance.query.filter_by(date=today, attendance_type='entrada', is_late=True)),
+                'ix_attendance_date_type_late'),
+            'escaneo: estado del empleado': (
+                scan_state_select('EMP001', datetime.now()),
+                'ix_attendance_employee_date_type'),
+            'escaneo: horario del día': (
+                scan_state_select('EMP001', datetime.now()),
+                'ix_work_schedule_employee_day'),
+            'reportes: resumen diario del período': (
+                daily_summary_select(today - timedelta(days=7), today),
+                'ix_daily_summary_date'),
+            'escáner: registros nuevos desde el cursor': (
+                feed_select(today, after_id=1000),
+                'ix_attendance_date_id'),
+        }
+
+    failed = False
+    for name, (statement, index_name) in checks.items():
+        plan = _explain(engine, statement)
+        ok = any(index_name in step for step in plan)
+        failed = failed or not ok
+        print(f"[{'OK' if ok else 'FALLA'}] {name}: {' | '.join(plan)}")
+    if failed:
+        sys.exit(1)
+
+
+def _scratch_app(db_path):
+    """Crea una app Flask mínima sobre una base SQLite temporal con el esquema actual."""
+    from flask import Flask
+    from models import db
+
+    scratch = Flask('benchmarks')
+    scratch.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    scratch.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(scratch)
+    with scratch.app_context():
+        db.create_all()
+    return scratch
+
+
+def _seed_history(num_employees, num_days, end_day):
+    """Inserta empleados activos y un historial de una entrada y una salida por día."""
+    from models import db, Employee, Attendance
+
+    db.session.execute(db.insert(Employee), [{
+        'employee_id': f"EMP{emp:05d}", 'name': 'Empleado', 'last_name': str(emp),
+        'department': f"Depto {emp % 7}", 'position': 'Operario',
+        'email': f"emp{emp}@empresa.com", 'phone': '555-0000', 'is_active': True,
+    } for emp in range(num_employees)])
+    for day in range(num_days):
+        current_date = end_day - timedelta(days=day + 1)
+        entrada = datetime.combine(current_date, datetime.min.time()) + timedelta(hours=8, minutes=5)
+        rows = []
+        for emp in range(num_employees):
+            rows.append({'employee_id': f"EMP{emp:05d}", 'attendance_type': 'entrada', 'timestamp': entrada,
+                         'date': current_date, 'is_late': True})
+            rows.append({'employee_id': f"EMP{emp:05d}", 'attendance_type': 'salida',
+                         'timestamp': entrada + timedelta(hours=8), 'date': current_date, 'is_late': False})
+        db.session.execute(db.insert(Attendance), rows)
+    db.session.commit()
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return p50 * 1000, p99 * 1000
+
+
+def _legacy_scan(employee_id, ahora):
+    """Ruta de escaneo anterior: cuatro consultas secuenciales antes del INSERT."""
+    from models import db, Employee, Attendance, WorkSchedule
+
+    employee = Employee.query.filter_by(employee_id=employee_id, is_active=True).first()
+    today = ahora.date()
+    entradas_hoy = Attendance.query.filter_by(employee_id=employee_id, date=today, attendance_type='entrada').count()
+    salidas_hoy = Attendance.query.filter_by(employee_id=employee_id, date=today, attendance_type='salida').count()
+    ws = WorkSchedule.query.filter_by(employee_id=employee_id, day_of_week=ahora.weekday(), is_active=True).first()
+    if employee and entradas_hoy == 0:
+        db.session.add(Attendance(employee_id=employee_id, attendance_type='entrada', timestamp=ahora,
+                                  date=today, is_late=False))
+        db.session.commit()
+
+
+def bench_scan(num_employees=2000, num_days=60, scans=500):
+    """
+    Latencia p50/p99 de un escaneo (consultas + INSERT + commit) con la ruta anterior
+    de cuatro consultas y con la consulta única de attendance_service.
+    """
+    from models import db
+    from attendance_service import register_scan
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch = _scratch_app(os.path.join(tmp, 'bench.db'))
+        today = date.today()
+        with scratch.app_context():
+            _seed_history(num_employees, num_days, today)
+
+            def run(scan, day):
+                ahora = datetime.combine(day, datetime.min.time()) + timedelta(hours=9)
+                samples = []
+                for emp in range(scans):
+                    started = time.perf_counter()
+                    scan(f"EMP{emp:05d}", ahora)
+                    samples.append(time.perf_counter() - started)
+                return _percentiles(samples)
+
+            def single_query(employee_id, ahora):
+                _, new_attendance = register_scan(employee_id, ahora)
+                if new_attendance is not None:
+                    db.session.commit()
+
+            before = run(_legacy_scan, today)
+            after = run(single_query, today + timedelta(days=1))
+
+    print(f"{num_employees} empleados, {num_employees * num_days * 2} registros de historial, {scans} escaneos")
+    print(f"{'ruta':>16} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'4 consultas':>16} {before[0]:>8.2f} {before[1]:>8.2f}")
+    print(f"{'consulta única':>16} {after[0]:>8.2f} {after[1]:>8.2f}")
+
+
+def bench_group_commit(num_employees=2000, threads=32):
+    """
+    Escaneos por segundo con solicitudes concurrentes: un commit por escaneo con la
+    configuración por defecto de SQLite, y el escritor de commit agrupado con WAL.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from models import db
+    from attendance_service import register_scan, record_scan
+    from extensions import enable_sqlite_pragmas
+    from group_commit import GroupCommitWriter
+
+    ahora = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=9)
+    employee_ids = [f"EMP{emp:05d}" for emp in range(num_employees)]
+
+    def run(scratch, scan):
+        def worker(employee_id):
+            with scratch.app_context():
+                try:
+                    scan(employee_id)
+                    return True
+                except Exception:
+                    db.session.rollback()
+                    return False
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            ok = sum(pool.map(worker, employee_ids))
+        return num_employees / (time.perf_counter() - started), num_employees - ok
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_app = _scratch_app(os.path.join(tmp, 'antes.db'))
+        with before_app.app_context():
+            _seed_history(num_employees, 0, ahora.date())
+
+        def own_commit(employee_id):
+            register_scan(employee_id, ahora)
+            db.session.commit()
+
+        before = run(before_app, own_commit)
+
+        after_app = _scratch_app(os.path.join(tmp, 'despues.db'))
+        enable_sqlite_pragmas(after_app)
+        with after_app.app_context():
+            _seed_history(num_employees, 0, ahora.date())
+        writer = GroupCommitWriter(after_app)
+        after = run(after_app, lambda employee_id: writer.execute(record_scan, employee_id, ahora))
+
+    print(f"{num_employees} escaneos desde {threads} hilos")
+    print(f"{'ruta':>22} {'escaneos/s':>11} {'errores':>8}")
+    print(f"{'commit por escaneo':>22} {before[0]:>11.0f} {before[1]:>8}")
+    print(f"{'commit agrupado + WAL':>22} {after[0]:>11.0f} {after[1]:>8}")
+
+
+def bench_events(subscribers=500, events=20):
+    """
+    Carga de /events: abre `subscribers` conexiones SSE contra un servidor con hilos en
+    este proceso, publica eventos y mide cuánto tarda cada uno en llegar a todas.
+    """
+    import logging
+    import resource
+    import selectors
+    import socket
+    import threading
+    from flask import Flask
+    from werkzeug.serving import make_server
+    from events import EventBroker, event_stream_response
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    broker = EventBroker()
+    scratch = Flask('benchmarks')
+    scratch.add_url_rule('/events', 'events', lambda: event_stream_response(broker))
+    server = make_server('127.0.0.1', 0, scratch, threaded=True)
+    server.socket.listen(subscribers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.socket.getsockname()[1]
+
+    selector = selectors.DefaultSelector()
+    received = {}
+    started = time.perf_counter()
+    for n in range(subscribers):
+        conn = socket.create_connection(('127.0.0.1', port))
+        conn.sendall(b"GET /events HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+        conn.setblocking(False)
+        selector.register(conn, selectors.EVENT_READ)
+        received[conn] = b''
+    while broker.subscribers < subscribers:
+        time.sleep(0.01)
+    connect_time = time.perf_counter() - started
+    threads = threading.active_count()
+
+    latencies = []
+    for n in range(1, events + 1):
+        marker = f"id: {broker.last_id + 1}\n".encode()
+        pending = set(received)
+        published = time.perf_counter()
+        broker.publish('asistencia', {'id': n, 'employee_id': f"EMP{n:05d}", 'attendance_type': 'entrada'})
+        while pending:
+            for key, _ in selector.select(timeout=5):
+                received[key.fileobj] += key.fileobj.recv(65536)
+                if marker in received[key.fileobj]:
+                    pending.discard(key.fileobj)
+                    received[key.fileobj] = b''
+        latencies.append(time.perf_counter() - published)
+
+    for conn in received:
+        selector.unregister(conn)
+        conn.close()
+    server.shutdown()
+    p50, p99 = _percentiles(latencies)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{subscribers} suscriptores conectados en {connect_time:.2f} s ({threads} hilos, "
+          f"memoria máxima del proceso {peak_mb:.0f} MB)")
+    print(f"entrega de un evento a todos: p50 {p50:.1f} ms, p99 {p99:.1f} ms ({events} eventos)")
+
+
+def bench_pdf(num_rows=50000):
+    """Tiempo y memoria máxima del proceso al generar un PDF general de num_rows filas."""
+    import io
+    import resource
+    from exports import build_pdf, REPORT_COLUMNS
+
+    rnd = random.Random(7)
+
+    def batches(batch_size=5000):
+        for start in range(0, num_rows, batch_size):
+            yield [(f"{1 + i % 28:02d}/07/2025", f"EMP{i % 3000:05d}", f"Empleado {i % 3000}", f"Depto {i % 7}",
+                    '08:05:00', '17:10:00', '9 horas, 5 minutos',
+                    'Av. Principal 123, Colonia Centro' * rnd.randint(1, 4))
+                   for i in range(start, min(start + batch_size, num_rows))]
+
+    buffer = io.BytesIO()
+    started = time.perf_counter()
+    build_pdf(buffer, "Reporte de Asistencia", "Período: 01/07/2025 - 28/07/2025", REPORT_COLUMNS, batches())
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{num_rows} filas: {elapsed:.1f} s, {len(buffer.getvalue()) / 1e6:.1f} MB de PDF, "
+          f"memoria máxima del proceso {peak_mb:.0f} MB")
+
+
+def bench_qr(num_employees=2000):
+    """
+    Regeneración de QR: generación en serie, en paralelo y segunda pasada
+    (archivos al día, que solo se verifican por hash).
+    """
+    from qr_generator import generate_qr_code, generate_qr_codes
+
+    items = [(f"EMP{emp:05d}", f"EMP{emp:05d}") for emp in range(num_employees)]
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        for data, employee_id in items:
+            generate_qr_code(data, employee_id, os.path.join(tmp, 'serie'))
+        serial = time.perf_counter() - started
+
+        target = os.path.join(tmp, 'paralelo')
+        started = time.perf_counter()
+        generate_qr_codes(items, target)
+        parallel = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = generate_qr_codes(items, target)
+        unchanged = time.perf_counter() - started
+        assert not any(changed for _, _, changed in results)
+
+    print(f"{num_employees} QR en {os.cpu_count()} CPU")
+    print(f"{'en serie':>22} {serial:>7.2f} s")
+    print(f"{'pool de procesos':>22} {parallel:>7.2f} s")
+    print(f"{'segunda pasada (hash)':>22} {unchanged:>7.2f} s")
+
+
+BENCHMARKS = {
+    'horas': bench_hours,
+    'planes': check_query_plans,
+    'escaneo': bench_scan,
+    'escritura': bench_group_commit,
+    'eventos': bench_events,
+    'pdf': bench_pdf,
+    'qr': bench_qr,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Benchmark desconocido: {name}. Opciones: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -0,0 +1,89 @@
+"""
+Caché en memoria con desalojo LRU (el menos usado recientemente sale primero).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Caché LRU segura entre hilos con un máximo de entradas y, opcionalmente, un
+    máximo de bytes (para valores bytes/str se usa len(valor) como tamaño) y un
+    tiempo de vida en segundos para cada entrada.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._expires = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            if self.ttl is not None and self._expires[key] < time.monotonic():
+                self._discard(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._discard(key)
+            size = len(value) if self.max_bytes is not None else 0
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # Nunca cabría: no desalojar todo por un solo valor
+            self._data[key] = value
+            self._sizes[key] = size
+            self._total_bytes += size
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self._total_bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._discard(oldest)
+
+    def _discard(self, key):
+        if key in self._data:
+            del self._data[key]
+            self._total_bytes -= self._sizes.pop(key)
+            self._expires.pop(key, None)
+
+    def get_or_create(self, key, factory):
+        """Devuelve el valor de key o lo calcula con factory() y lo guarda (también si es None)."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, default)
+            self._discard(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._expires.clear()
+            self._total_bytes = 0
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
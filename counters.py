@@ -0,0 +1,135 @@
+"""
+Contadores del dashboard mantenidos de forma incremental.
+
+Cada escaneo y cada alta o baja de empleado actualiza sus contadores dentro de la
+misma transacción, de modo que el dashboard los lee con una sola consulta por clave
+primaria en lugar de contar filas de Attendance en cada visita.
+"""
+from extensions import dialect_insert
+from models import db, DashboardCounter, Employee, Attendance
+
+ACTIVE_EMPLOYEES = 'empleados_activos'
+DAILY_ENTRADAS = 'entradas'
+DAILY_LATE = 'tarde'
+# Cantidad de ediciones, para detectar cambios que no agregan filas nuevas
+ATTENDANCE_EDITS = 'ediciones_asistencia'
+EMPLOYEE_EDITS = 'ediciones_empleados'
+# Revisión de los datos de un día: sube con cada registro o edición de esa fecha
+DATA_REVISION = 'revision'
+
+
+def daily_key(name, day):
+    """Clave de un contador diario, ej. 'entradas:2025-07-25'."""
+    return f"{name}:{day.isoformat()}"
+
+
+def increment(name, delta=1):
+    """
+    Suma delta al contador de forma atómica (UPDATE value = value + delta).
+    Se ejecuta en la sesión actual: el commit lo hace quien registra el cambio.
+    """
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(DashboardCounter).values(name=name, value=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DashboardCounter.name],
+            set_={'value': DashboardCounter.value + delta},
+        )
+        db.session.execute(stmt)
+        return
+    updated = db.session.execute(
+        db.update(DashboardCounter).where(DashboardCounter.name == name)
+        .values(value=DashboardCounter.value + delta)
+    )
+    if updated.rowcount == 0:
+        db.session.add(DashboardCounter(name=name, value=delta))
+
+
+def touch_date(day):
+    """Marca que cambiaron los datos de asistencia de un día (invalida los reportes que lo incluyen)."""
+    increment(daily_key(DATA_REVISION, day))
+
+
+def track_attendance(attendance):
+    """Actualiza los contadores diarios con un nuevo registro de asistencia."""
+    touch_date(attendance.date)
+    if attendance.attendance_type != 'entrada':
+        return
+    increment(daily_key(DAILY_ENTRADAS, attendance.date))
+    if attendance.is_late:
+        increment(daily_key(DAILY_LATE, attendance.date))
+
+
+def get_counter(name):
+    """Valor actual de un contador (0 si todavía no existe)."""
+    value = db.session.execute(
+        db.select(DashboardCounter.value).where(DashboardCounter.name == name)
+    ).scalar()
+    return value or 0
+
+
+def get_range_revision(start_date, end_date):
+    """
+    Versión de los datos de un rango de fechas: (suma de las revisiones de sus días,
+    ediciones de empleados). Los contadores solo crecen, así cualquier registro o edición
+    en una fecha del rango (o un cambio de nombre o departamento) da otra versión, y los
+    cambios en otras fechas no la afectan. Las claves 'revision:AAAA-MM-DD' se ordenan
+    como las fechas, así la suma es una búsqueda por rango en la clave primaria.
+    """
+    revisions = db.select(db.func.coalesce(db.func.sum(DashboardCounter.value), 0)).where(
+        DashboardCounter.name.between(daily_key(DATA_REVISION, start_date), daily_key(DATA_REVISION, end_date))
+    ).scalar_subquery()
+    employee_edits = db.select(db.func.coalesce(db.func.sum(DashboardCounter.value), 0)).where(
+        DashboardCounter.name == EMPLOYEE_EDITS).scalar_subquery()
+    return tuple(db.session.execute(db.select(revisions, employee_edits)).one())
+
+
+def get_dashboard_counts(today):
+    """
+    Devuelve (total_empleados, total_asistencias, llegadas_tarde) para el día indicado.
+    Solo lee: los contadores los crea la migración que los inicializa (o rebuild_counters.py)
+    y los mantienen los registros y altas; una clave que falta vale 0.
+    """
+    keys = [ACTIVE_EMPLOYEES, daily_key(DAILY_ENTRADAS, today), daily_key(DAILY_LATE, today)]
+    values = dict(db.session.execute(
+        db.select(DashboardCounter.name, DashboardCounter.value).where(DashboardCounter.name.in_(keys))
+    ).all())
+    return tuple(values.get(key, 0) for key in keys)
+
+
+def rebuild_counters():
+    """
+    Recalcula los contadores del dashboard a partir de Employee y Attendance para corregir
+    cualquier desvío. Los valores se escriben con upsert: dos reconstrucciones a la vez
+    no chocan por clave primaria. No hace commit.
+    """
+    active = db.session.execute(
+        db.select(db.func.count(Employee.id)).where(Employee.is_active == True)
+    ).scalar()
+    daily = db.session.execute(
+        db.select(
+            Attendance.date,
+            db.func.count(Attendance.id),
+            db.func.sum(db.case((Attendance.is_late == True, 1), else_=0)),
+        ).where(Attendance.attendance_type == 'entrada').group_by(Attendance.date)
+    ).all()
+
+    rows = [{'name': ACTIVE_EMPLOYEES, 'value': active}]
+    for day, entradas, tarde in daily:
+        rows.append({'name': daily_key(DAILY_ENTRADAS, day), 'value': entradas})
+        if tarde:
+            rows.append({'name': daily_key(DAILY_LATE, day), 'value': int(tarde)})
+
+    db.session.execute(db.delete(DashboardCounter).where(db.or_(
+        DashboardCounter.name.like(f"{DAILY_ENTRADAS}:%"),
+        DashboardCounter.name.like(f"{DAILY_LATE}:%"),
+    )))
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(DashboardCounter)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[DashboardCounter.name], set_={'value': stmt.excluded.value}), rows)
+    else:
+        for row in rows:
+            db.session.merge(DashboardCounter(**row))
+    return len(rows)
@@ -0,0 +1,102 @@
+"""
+Resumen diario de asistencia por empleado.
+
+Guarda una fila por empleado y día con la primera entrada y la última salida, de modo
+que los reportes leen una fila por empleado-día en lugar de agrupar los registros
+crudos. Se actualiza en la misma transacción que registra o edita una asistencia.
+"""
+from extensions import dialect_insert
+from models import db, Attendance, DailyAttendanceSummary
+
+SUMMARY_FIELDS = ['entrada_id', 'entrada_time', 'salida_time', 'address', 'latitude', 'longitude']
+
+
+def summarize_punches(punches):
+    """
+    Calcula los campos del resumen a partir de los registros de un empleado en un día,
+    como tuplas (id, tipo, timestamp, address, latitude, longitude).
+    """
+    entradas = sorted((p for p in punches if p[1] == 'entrada'), key=lambda p: (p[2], p[0]))
+    salidas = [p[2] for p in punches if p[1] == 'salida']
+    first = entradas[0] if entradas else None
+    return {
+        'entrada_id': first[0] if first else None,
+        'entrada_time': first[2] if first else None,
+        'salida_time': max(salidas) if salidas else None,
+        'address': first[3] if first else None,
+        'latitude': first[4] if first else None,
+        'longitude': first[5] if first else None,
+    }
+
+
+def refresh_daily_summary(employee_id, day):
+    """
+    Recalcula la fila de resumen de un empleado en un día desde sus registros.
+    Se ejecuta en la sesión actual: el commit lo hace quien registra el cambio.
+    """
+    punches = db.session.execute(
+        db.select(Attendance.id, Attendance.attendance_type, Attendance.timestamp,
+                  Attendance.address, Attendance.latitude, Attendance.longitude)
+        .where(Attendance.employee_id == employee_id, Attendance.date == day)
+    ).all()
+    key = (DailyAttendanceSummary.employee_id == employee_id, DailyAttendanceSummary.date == day)
+    if not punches:
+        db.session.execute(db.delete(DailyAttendanceSummary).where(*key))
+        return
+
+    values = summarize_punches(punches)
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(DailyAttendanceSummary).values(employee_id=employee_id, date=day, **values)
+        stmt = stmt.on_conflict_do_update(index_elements=['employee_id', 'date'], set_=values)
+        db.session.execute(stmt)
+        return
+    updated = db.session.execute(db.update(DailyAttendanceSummary).where(*key).values(**values))
+    if updated.rowcount == 0:
+        db.session.add(DailyAttendanceSummary(employee_id=employee_id, date=day, **values))
+
+
+def rebuild_daily_summaries(start_date=None, end_date=None):
+    """
+    Reconstruye los resúmenes del rango indicado (o de todo el historial) con
+    sentencias en bloque sobre Attendance. No hace commit. Devuelve las filas creadas.
+    """
+    summary = DailyAttendanceSummary
+    attendance_range, summary_range = [], []
+    if start_date:
+        attendance_range.append(Attendance.date >= start_date)
+        summary_range.append(summary.date >= start_date)
+    if end_date:
+        attendance_range.append(Attendance.date <= end_date)
+        summary_range.append(summary.date <= end_date)
+
+    db.session.execute(db.delete(summary).where(*summary_range))
+
+    grouped = db.select(
+        Attendance.employee_id,
+        Attendance.date,
+        db.func.min(db.case((Attendance.attendance_type == 'entrada', Attendance.timestamp))),
+        db.func.max(db.case((Attendance.attendance_type == 'salida', Attendance.timestamp))),
+    ).where(*attendance_range).group_by(Attendance.employee_id, Attendance.date)
+    created = db.session.execute(
+        db.insert(summary).from_select(['employee_id', 'date', 'entrada_time', 'salida_time'], grouped)
+    ).rowcount
+
+    # Id de la primera entrada y, desde ese registro, su ubicación
+    first_entrada_id = db.select(db.func.min(Attendance.id)).where(
+        Attendance.employee_id == summary.employee_id,
+        Attendance.date == summary.date,
+        Attendance.attendance_type == 'entrada',
+        Attendance.timestamp == summary.entrada_time,
+    ).scalar_subquery()
+    db.session.execute(db.update(summary).where(*summary_range).values(entrada_id=first_entrada_id))
+
+    def from_entrada(column):
+        return db.select(column).where(Attendance.id == summary.entrada_id).scalar_subquery()
+
+    db.session.execute(db.update(summary).where(summary.entrada_id.isnot(None), *summary_range).values(
+        address=from_entrada(Attendance.address),
+        latitude=from_entrada(Attendance.latitude),
+        longitude=from_entrada(Attendance.longitude),
+    ))
+    return created
@@ -0,0 +1,137 @@
+"""
+Importación masiva de empleados desde CSV o Excel.
+
+Valida todas las filas por columnas con los mismos validadores de add_employee,
+comprueba la unicidad contra la base de datos con una consulta por lote y agrega los
+empleados válidos en lotes, cada uno en su propia transacción. Devuelve un reporte
+con los errores de cada fila rechazada.
+"""
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Employee
+from counters import increment, ACTIVE_EMPLOYEES, EMPLOYEE_EDITS
+from validators import validate_employee_id, validate_email, validate_name
+
+IMPORT_COLUMNS = ['employee_id', 'name', 'last_name', 'department', 'position', 'email', 'phone']
+# Empleados por transacción al insertar
+IMPORT_BATCH_SIZE = 500
+
+
+def read_import_file(fileobj, filename):
+    """
+    Lee el archivo subido como texto. Devuelve (DataFrame, None) o (None, mensaje de error).
+    Las filas se numeran como en la hoja de cálculo (la fila 1 es la cabecera).
+    """
+    extension = filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+    try:
+        if extension == 'csv':
+            df = pd.read_csv(fileobj, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        elif extension == 'xlsx':
+            df = pd.read_excel(fileobj, dtype=str, keep_default_na=False, engine='openpyxl')
+        else:
+            return None, 'Formato no soportado. Use un archivo .csv o .xlsx.'
+    except Exception as e:
+        return None, f'No se pudo leer el archivo: {e}'
+
+    df.columns = [str(column).strip().lower() for column in df.columns]
+    missing = [column for column in IMPORT_COLUMNS if column not in df.columns]
+    if missing:
+        return None, f"Faltan columnas: {', '.join(missing)}."
+    df = df[IMPORT_COLUMNS].fillna('').astype(str)
+    for column in IMPORT_COLUMNS:
+        df[column] = df[column].str.strip()
+    df['email'] = df['email'].str.lower()
+    df.index = range(2, len(df) + 2)
+    return df, None
+
+
+def find_existing(df, batch_size=IMPORT_BATCH_SIZE):
+    """
+    IDs y emails del archivo que ya están registrados. Consulta por lotes de filas: cada
+    consulta lleva 2 parámetros por fila y SQLite limita los parámetros por sentencia.
+    """
+    existing_ids, existing_emails = set(), set()
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        existing = db.session.execute(
+            db.select(Employee.employee_id, Employee.email).where(db.or_(
+                Employee.employee_id.in_(set(batch['employee_id'])), Employee.email.in_(set(batch['email'])),
+            ))
+        ).all()
+        existing_ids.update(row.employee_id for row in existing)
+        existing_emails.update(row.email for row in existing)
+    return existing_ids, existing_emails
+
+
+def validate_import(df):
+    """
+    Valida todas las filas columna por columna. Devuelve (filas válidas, errores), donde
+    errores es una lista de dicts {'fila', 'employee_id', 'errores'}.
+    """
+    checks = [
+        ((df[IMPORT_COLUMNS] == '').any(axis=1), 'Todos los campos son obligatorios'),
+        (~df['name'].map(validate_name), 'Nombre inválido'),
+        (~df['last_name'].map(validate_name), 'Apellido inválido'),
+        (~df['employee_id'].map(validate_employee_id), 'ID de empleado inválido'),
+        (~df['email'].map(validate_email), 'Formato de email inválido'),
+        ((df['department'].str.len() > 50) | (df['position'].str.len() > 50),
+         'Departamento y posición no pueden exceder 50 caracteres'),
+        (df['phone'].str.len() > 20, 'Teléfono no puede exceder 20 caracteres'),
+        (df['employee_id'].duplicated(keep=False), 'ID de empleado repetido en el archivo'),
+        (df['email'].duplicated(keep=False), 'Email repetido en el archivo'),
+    ]
+
+    existing_ids, existing_emails = find_existing(df)
+    checks.append((df['employee_id'].isin(existing_ids), 'El ID de empleado ya está registrado'))
+    checks.append((df['email'].isin(existing_emails), 'El correo electrónico ya está registrado'))
+
+    messages = pd.Series([[] for _ in range(len(df))], index=df.index)
+    for mask, message in checks:
+        for row_number in df.index[mask]:
+            messages[row_number].append(message)
+
+    invalid = messages.map(bool)
+    errors = [{'fila': row_number, 'employee_id': df.at[row_number, 'employee_id'], 'errores': '; '.join(messages[row_number])}
+              for row_number in df.index[invalid]]
+    return df[~invalid], errors
+
+
+def insert_employees(df, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Inserta los empleados válidos por lotes, un commit por lote, y actualiza los
+    contadores. Si un lote falla (ej. otro usuario agregó el mismo ID mientras tanto)
+    se descarta solo ese lote. Devuelve (insertados, errores).
+    """
+    inserted, errors = 0, []
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        rows = [dict(row, is_active=True) for row in batch[IMPORT_COLUMNS].to_dict('records')]
+        try:
+            db.session.execute(db.insert(Employee), rows)
+            increment(ACTIVE_EMPLOYEES, len(rows))
+            increment(EMPLOYEE_EDITS)
+            db.session.commit()
+            inserted += len(rows)
+        except IntegrityError:
+            db.session.rollback()
+            errors.extend({'fila': row_number, 'employee_id': row['employee_id'],
+                           'errores': 'No se guardó: conflicto con un empleado registrado durante la importación'}
+                          for row_number, row in batch.iterrows())
+    return inserted, errors
+
+
+def import_employees(fileobj, filename):
+    """
+    Importa empleados desde un archivo. Devuelve (resultado, None) con
+    {'total', 'importados', 'errores'} o (None, mensaje) si el archivo no es válido.
+    """
+    df, error = read_import_file(fileobj, filename)
+    if error:
+        return None, error
+    if df.empty:
+        return None, 'El archivo no tiene filas de empleados.'
+    valid, errors = validate_import(df)
+    inserted, insert_errors = insert_employees(valid)
+    errors = sorted(errors + insert_errors, key=lambda e: e['fila'])
+    return {'total': len(df), 'importados': inserted, 'errores': errors}, None
@@ -0,0 +1,258 @@
+"""
+Eventos de asistencia en vivo por Server-Sent Events (SSE).
+
+Los cambios se anotan con queue_event(), que agrega una fila de LiveEvent a la sesión:
+el evento se guarda en la misma transacción que el cambio y, si esta (o su savepoint)
+se deshace, desaparece con él. El id de la fila es el id del evento SSE, el mismo en
+todos los workers, así una reconexión con Last-Event-ID puede llegar a cualquiera.
+
+Cada proceso tiene un EventBroker con un hilo que lee de la tabla los eventos nuevos
+(cada EVENT_POLL_SECONDS, o enseguida después de un commit del propio proceso) y los
+deja en un búfer circular. Así el servidor puede tener varios workers: cada uno recibe
+también lo que confirmaron los demás. Difundir cuesta lo mismo con un suscriptor que
+con cientos, porque cada conexión abierta espera en la misma condición y, al
+despertar, copia del búfer los eventos posteriores al último que envió.
+
+En SQLite los ids se confirman en orden (hay un solo escritor a la vez), por eso basta
+con leer los mayores al último leído. Las filas se borran a los EVENT_RETENTION segundos.
+
+Configuración (app.config):
+    EVENT_POLL_SECONDS  segundos entre lecturas de la tabla de eventos (1)
+    EVENT_RETENTION     segundos que se conservan los eventos en la tabla (3600)
+
+Eventos:
+    asistencia  nuevo registro, con los mismos campos que un elemento de /scanner/feed y 'date'
+    edicion     hora de un registro cambiada: {'id', 'employee_id', 'date', 'time'}
+    resync      el cliente se atrasó más que el búfer; debe volver a cargar su estado
+"""
+import json
+import os
+import threading
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from flask import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, LiveEvent
+
+DEFAULTS = {
+    'EVENT_POLL_SECONDS': 1,
+    'EVENT_RETENTION': 3600,
+}
+# Eventos que se pueden recuperar al reconectar con Last-Event-ID
+EVENT_HISTORY = 256
+# Filas leídas por consulta
+EVENT_FETCH_LIMIT = 500
+# Cada cuántas lecturas se borran los eventos vencidos
+EVENT_PURGE_EVERY = 600
+# Segundos entre comentarios de latido; detectan conexiones cerradas y evitan cortes de proxies
+HEARTBEAT_SECONDS = 15
+# Milisegundos que espera EventSource antes de reconectar
+RETRY_MS = 3000
+
+Event = namedtuple('Event', ['id', 'type', 'data'])
+
+# Brokers del proceso, para despertarlos después de un commit con eventos
+_brokers = []
+
+
+class EventBroker:
+    """
+    Búfer circular de eventos y una condición compartida. Con app, un hilo por proceso
+    lo alimenta desde la tabla LiveEvent; sin app solo difunde lo que se le publica.
+    """
+
+    def __init__(self, app=None, history=EVENT_HISTORY):
+        self.app = app
+        self._events = deque(maxlen=history)
+        self._last_id = 0
+        # Los eventos con id hasta aquí ya no están en el búfer
+        self._dropped_id = 0
+        self._condition = threading.Condition()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self.subscribers = 0
+        if app is not None:
+            _brokers.append(self)
+
+    def _config(self, name):
+        return self.app.config.get(name, DEFAULTS[name])
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def _ensure_started(self):
+        """Carga los últimos eventos y arranca el hilo en el primer uso de cada proceso."""
+        if self.app is None or (self._pid == os.getpid() and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._load_recent()
+            self._thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _load_recent(self):
+        history = self._events.maxlen
+        with self.app.app_context():
+            rows = db.session.execute(db.select(LiveEvent.id, LiveEvent.type, LiveEvent.data)
+                                      .order_by(LiveEvent.id.desc()).limit(history + 1)).all()
+        rows.reverse()
+        with self._condition:
+            self._events.clear()
+            if len(rows) > history:
+                self._dropped_id = rows.pop(0).id
+            else:
+                self._dropped_id = rows[0].id - 1 if rows else 0
+            self._events.extend(Event(row.id, row.type, json.loads(row.data)) for row in rows)
+            self._last_id = rows[-1].id if rows else 0
+
+    def subscribe(self, limit=None):
+        """Registra un suscriptor y devuelve el id del último evento, o None si ya hay `limit`."""
+        with self._condition:
+            if limit is not None and self.subscribers >= limit:
+                return None
+            self.subscribers += 1
+        try:
+            self._ensure_started()
+            # Lectura inmediata: el suscriptor empieza después de lo ya confirmado
+            self.fetch()
+        except Exception:
+            self.unsubscribe()
+            raise
+        return self._last_id
+
+    def unsubscribe(self):
+        with self._condition:
+            self.subscribers -= 1
+
+    def _deliver(self, events):
+        with self._condition:
+            for e in events:
+                if len(self._events) == self._events.maxlen:
+                    self._dropped_id = self._events[0].id
+                self._events.append(e)
+                self._last_id = e.id
+            self._condition.notify_all()
+
+    def publish(self, event_type, data):
+        """Difunde un evento solo en este proceso (sin pasar por la tabla)."""
+        self._deliver([Event(self._last_id + 1, event_type, data)])
+
+    def wake(self):
+        """Pide al hilo que lea la tabla ahora (ej. después de un commit con eventos)."""
+        self._wakeup.set()
+
+    def fetch(self):
+        """Lee de la tabla los eventos posteriores al último leído y despierta a los suscriptores."""
+        if self.app is None:
+            return 0
+        with self._fetch_lock:
+            with self.app.app_context():
+                rows = db.session.execute(db.select(LiveEvent.id, LiveEvent.type, LiveEvent.data)
+                                          .where(LiveEvent.id > self._last_id)
+                                          .order_by(LiveEvent.id).limit(EVENT_FETCH_LIMIT)).all()
+            if rows:
+                self._deliver([Event(row.id, row.type, json.loads(row.data)) for row in rows])
+            return len(rows)
+
+    def purge(self, now=None):
+        """Borra los eventos más antiguos que EVENT_RETENTION. Devuelve cuántos borró."""
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=self._config('EVENT_RETENTION'))
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                return connection.execute(db.delete(LiveEvent).where(LiveEvent.created_at < cutoff)).rowcount
+
+    def _run(self):
+        polls = 0
+        while True:
+            self._wakeup.wait(self._config('EVENT_POLL_SECONDS'))
+            self._wakeup.clear()
+            try:
+                while self.fetch() == EVENT_FETCH_LIMIT:
+                    pass
+                polls += 1
+                if polls % EVENT_PURGE_EVERY == 0:
+                    self.purge()
+            except Exception:
+                self.app.logger.exception('Error al leer los eventos en vivo')
+
+    def wait(self, after_id, timeout):
+        """
+        Espera eventos con id mayor a after_id. Devuelve (eventos, resync): resync es True
+        si alguno de los eventos posteriores a after_id ya salió del búfer.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > after_id, timeout)
+            if self._last_id <= after_id:
+                return [], False
+            if after_id < self._dropped_id:
+                return [], True
+            return [e for e in self._events if e.id > after_id], False
+
+
+def format_event(e):
+    return f"id: {e.id}\nevent: {e.type}\ndata: {json.dumps(e.data)}\n\n"
+
+
+def event_stream_response(broker, last_event_id=None, heartbeat=HEARTBEAT_SECONDS, max_subscribers=None):
+    """
+    Respuesta SSE para un suscriptor, o None si ya hay max_subscribers conexiones. Con
+    last_event_id (cabecera Last-Event-ID de una reconexión) se envían primero los
+    eventos que se perdió. El flujo no usa el contexto de la solicitud, así la conexión
+    abierta no retiene una sesión de base de datos.
+    """
+    last_id = broker.subscribe(max_subscribers)
+    if last_id is None:
+        return None
+    after_id = last_id if last_event_id is None else last_event_id
+
+    def stream():
+        nonlocal after_id
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            events, resync = broker.wait(after_id, heartbeat)
+            if resync:
+                after_id = broker.last_id
+                yield format_event(Event(after_id, 'resync', {}))
+            elif events:
+                after_id = events[-1].id
+                yield ''.join(format_event(e) for e in events)
+            else:
+                yield ': ping\n\n'
+
+    response = Response(stream(), mimetype='text/event-stream')
+    # El servidor cierra la respuesta al cortarse la conexión, aunque el flujo no haya empezado
+    response.call_on_close(broker.unsubscribe)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def queue_event(session, event_type, data):
+    """Agrega el evento a la sesión: se guarda y se difunde con el commit de su transacción."""
+    session.add(LiveEvent(type=event_type, data=json.dumps(data)))
+    session.info['events_queued'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_brokers(session):
+    # SQLAlchemy también lo llama al liberar un savepoint: se espera al commit principal
+    if session.in_nested_transaction() or not session.info.pop('events_queued', False):
+        return
+    for broker in _brokers:
+        broker.wake()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_queued(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('events_queued', None)
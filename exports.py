@@ -0,0 +1,246 @@
+"""
+Exportación de reportes de asistencia a archivos descargables.
+"""
+import csv
+import io
+import json
+
+import pandas as pd
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import simpleSplit
+from reportlab.lib.units import inch, cm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from reports import ATTENDANCE_COLUMNS, iter_attendance_batches, iter_report_chunks
+
+# Columnas de los reportes individual y general detallado (sin attendance_id)
+REPORT_COLUMNS = ['Fecha', 'ID', 'Nombre', 'Departamento', 'Entrada', 'Salida', 'Horas Trabajadas', 'Dirección']
+
+
+# Estilos del PDF, creados una sola vez y compartidos por todas las exportaciones
+PDF_STYLES = getSampleStyleSheet()
+PDF_FONT = 'Helvetica'
+PDF_FONT_SIZE = 6
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), PDF_FONT_SIZE),
+    ('LEADING', (0, 1), (-1, -1), 7),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 2),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+])
+# Filas por tabla: el PDF se arma con tablas cortas que reportlab distribuye sin
+# tener que medir una sola tabla gigante
+PDF_ROWS_PER_TABLE = 40
+PDF_TABLE_WIDTH = 7.2 * inch
+PDF_ADDRESS_MAX_LEN = 120
+
+# Columnas de la exportación de registros crudos
+RAW_COLUMNS = ['attendance_id', 'employee_id', 'employee_name', 'department', 'date',
+               'timestamp', 'attendance_type', 'address', 'latitude', 'longitude']
+
+
+def _excel_value(value):
+    """Celdas vacías en lugar de NaN/NA."""
+    return None if pd.isna(value) else value
+
+
+def write_excel_report(fileobj, start_date, end_date, employee_id=None, progress=None):
+    """
+    Escribe el reporte en formato Excel en fileobj.
+    Usa un libro de solo escritura (streaming): las filas se vuelcan a medida que se
+    agregan, y el reporte se lee por bloques de días, así la memoria no crece con el período.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(REPORT_COLUMNS)
+    for chunk in iter_report_chunks(start_date, end_date, employee_id, progress=progress):
+        for row in chunk[REPORT_COLUMNS].itertuples(index=False, name=None):
+            sheet.append([_excel_value(value) for value in row])
+    workbook.save(fileobj)
+
+
+def iter_raw_rows(start_date=None, end_date=None, employee_id=None):
+    """Lotes de registros crudos (tuplas en el orden de RAW_COLUMNS)."""
+    name_idx = ATTENDANCE_COLUMNS.index('name')
+    last_name_idx = ATTENDANCE_COLUMNS.index('last_name')
+    for batch in iter_attendance_batches(start_date, end_date, employee_id):
+        rows = []
+        for row in batch:
+            row = list(row)
+            full_name = f"{row[name_idx]} {row[last_name_idx]}"
+            del row[last_name_idx], row[name_idx]
+            row.insert(2, full_name)
+            rows.append(row)
+        yield rows
+
+
+def iter_summary_rows(start_date, end_date, employee_id=None, progress=None):
+    """Lotes del reporte resumido por empleado y día (tuplas en el orden de REPORT_COLUMNS)."""
+    for chunk in iter_report_chunks(start_date, end_date, employee_id, progress=progress):
+        yield [[_excel_value(value) for value in row]
+               for row in chunk[REPORT_COLUMNS].itertuples(index=False, name=None)]
+
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(columns, batches):
+    """Genera el CSV por partes: la cabecera y luego un bloque de texto por lote."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(columns, batches):
+    """Genera NDJSON (un objeto JSON por línea), un bloque de texto por lote."""
+    for rows in batches:
+        yield ''.join(
+            json.dumps({column: _json_value(value) for column, value in zip(columns, row)}, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+def _pdf_column_widths(columns):
+    """Ancho fijo grande para la dirección y el resto repartido en partes iguales."""
+    col_count = len(columns)
+    direccion_idx = next((i for i, col in enumerate(columns) if 'direc' in col.lower()), None)
+    if direccion_idx is not None and col_count > 1:
+        dir_col_width = 5.0 * cm
+        other_col_width = (PDF_TABLE_WIDTH - dir_col_width) / (col_count - 1)
+        return [dir_col_width if i == direccion_idx else other_col_width for i in range(col_count)], direccion_idx
+    col_width = max(PDF_TABLE_WIDTH / col_count, 1.2 * cm)
+    return [col_width] * col_count, None
+
+
+def _pdf_cells(rows, max_chars, direccion_idx, address_width):
+    """Trunca las celdas al ancho de su columna; la dirección se ajusta en varias líneas si no entra."""
+    formatted = []
+    for row in rows:
+        cells = []
+        for i, value in enumerate(row):
+            text = '' if value is None or (not isinstance(value, str) and pd.isna(value)) else str(value)
+            if i == direccion_idx:
+                if len(text) > max_chars[i]:
+                    if len(text) > PDF_ADDRESS_MAX_LEN:
+                        text = text[:PDF_ADDRESS_MAX_LEN] + '...'
+                    # Cortar en líneas con el ancho real del texto: mucho más barato que un Paragraph por celda
+                    text = '\n'.join(simpleSplit(text, PDF_FONT, PDF_FONT_SIZE, address_width))
+            elif len(text) > max_chars[i]:
+                text = text[:max_chars[i] - 3] + '...'
+            cells.append(text)
+        formatted.append(cells)
+    return formatted
+
+
+class _ChunkedDocTemplate(SimpleDocTemplate):
+    """
+    SimpleDocTemplate que recibe las tablas por bloques: build() recibe una lista real
+    con el encabezado y, desde handle_flowable (el gancho de BaseDocTemplate para
+    procesar cada flowable), se le agregan las tablas del bloque siguiente antes de que
+    se vacíe. Así solo están en memoria las tablas de un par de bloques a la vez.
+    """
+
+    def __init__(self, fileobj, chunks, **kwargs):
+        super().__init__(fileobj, **kwargs)
+        self._chunks = chunks
+        self._flowables = None
+
+    def build(self, flowables, **kwargs):
+        self._flowables = flowables
+        super().build(flowables, **kwargs)
+
+    def handle_flowable(self, flowables):
+        # build() termina cuando la lista queda vacía: se rellena mientras queden bloques.
+        # También se llama con la lista interna de marcadores de página, que no se toca.
+        while flowables is self._flowables and self._chunks is not None and len(flowables) < 2:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._chunks = None
+            else:
+                flowables.extend(chunk)
+        super().handle_flowable(flowables)
+
+
+def build_pdf(fileobj, title, subtitle, columns, batches, subtitle_style='Heading3'):
+    """
+    Genera un PDF con una tabla de datos en fileobj.
+    Las filas llegan por lotes (batches) y se parten en tablas de PDF_ROWS_PER_TABLE filas
+    que repiten la cabecera, creadas lote por lote a medida que reportlab avanza.
+    """
+    head = [Paragraph(title, PDF_STYLES['Title'])]
+    if subtitle:
+        head.append(Paragraph(subtitle, PDF_STYLES[subtitle_style]))
+    head.append(Spacer(1, 12))
+
+    col_widths, direccion_idx = _pdf_column_widths(columns)
+    max_chars = [int(w // 4) for w in col_widths]
+    address_width = col_widths[direccion_idx] - 8 if direccion_idx is not None else None
+    # Cambiar cabecera 'Horas Trabajadas' por dos líneas
+    header = ['Horas\nTrabajadas' if col == 'Horas Trabajadas' else col for col in columns]
+
+    table_style = PDF_TABLE_STYLE
+    if direccion_idx is not None:
+        # La dirección va alineada a la izquierda, como un párrafo
+        table_style = TableStyle(PDF_TABLE_STYLE.getCommands() + [('ALIGN', (direccion_idx, 1), (direccion_idx, -1), 'LEFT')])
+
+    def table(rows):
+        t = Table([header] + rows, colWidths=col_widths, hAlign='CENTER', repeatRows=1)
+        t.setStyle(table_style)
+        return t
+
+    def chunks():
+        """Una lista de tablas de PDF_ROWS_PER_TABLE filas por cada lote recibido."""
+        pending = []
+        has_rows = False
+        for rows in batches:
+            pending.extend(_pdf_cells(rows, max_chars, direccion_idx, address_width))
+            full = len(pending) - len(pending) % PDF_ROWS_PER_TABLE
+            if full:
+                yield [table(pending[i:i + PDF_ROWS_PER_TABLE]) for i in range(0, full, PDF_ROWS_PER_TABLE)]
+                del pending[:full]
+                has_rows = True
+        if pending:
+            yield [table(pending)]
+        elif not has_rows:
+            yield [Paragraph("No hay datos para el período seleccionado.", PDF_STYLES['Normal'])]
+
+    doc = _ChunkedDocTemplate(fileobj, chunks(), pagesize=letter,
+                              rightMargin=20, leftMargin=20, topMargin=20, bottomMargin=20)
+    doc.build(head)
+
+
+def write_pdf_report(fileobj, start_date, end_date, employee_id=None, employee_name=None, progress=None):
+    """
+    Escribe en fileobj el reporte individual (con employee_id) o general detallado en PDF.
+    """
+    start_date_formatted = start_date.strftime('%d/%m/%Y')
+    end_date_formatted = end_date.strftime('%d/%m/%Y')
+    if employee_id:
+        # Subtítulo con empleado y fechas si es reporte individual
+        subtitle = f"{employee_name} - {start_date_formatted} - {end_date_formatted}" if employee_name else None
+        subtitle_style = 'Heading2'
+    else:
+        # Para reportes generales, solo mostrar el rango de fechas
+        subtitle = f"Período: {start_date_formatted} - {end_date_formatted}"
+        subtitle_style = 'Heading3'
+    build_pdf(fileobj, "Reporte de Asistencia", subtitle, REPORT_COLUMNS,
+              iter_summary_rows(start_date, end_date, employee_id, progress), subtitle_style=subtitle_style)
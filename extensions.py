@@ -1,3 +1,62 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 db = SQLAlchemy()
+
+# Ajustes de cada conexión SQLite: WAL deja leer mientras otro escribe, synchronous=NORMAL
+# hace fsync al pasar el WAL a la base y no en cada commit, y busy_timeout espera el
+# bloqueo de escritura en lugar de fallar con "database is locked".
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+]
+
+def enable_sqlite_pragmas(app):
+    """
+    Aplica SQLITE_PRAGMAS a cada conexión nueva del motor de la app, si es SQLite.
+
+    Las transacciones con la opción de ejecución sqlite_immediate=True (el escritor de
+    commit agrupado) empiezan con BEGIN IMMEDIATE: toman el bloqueo de escritura desde el
+    inicio y sus SAVEPOINT de begin_nested() se anidan dentro. El resto queda con el
+    manejo propio de pysqlite, que abre la transacción recién en la primera escritura:
+    un BEGIN diferido al empezar la sesión fijaría la instantánea de lectura de WAL, y
+    si otra conexión confirma antes de la primera escritura esta falla con "database is
+    locked" sin que busy_timeout la reintente.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin(conn):
+        if conn.get_execution_options().get('sqlite_immediate'):
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+def dialect_insert():
+    """
+    Devuelve la función insert del dialecto en uso si soporta ON CONFLICT
+    (SQLite y PostgreSQL), o None para otros motores.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
@@ -0,0 +1,319 @@
+"""
+Geocodificación inversa (coordenadas -> dirección) en el servidor, con caché persistente.
+
+Las coordenadas se redondean a una cuadrícula configurable, así todos los escaneos
+hechos en un mismo sitio comparten una entrada de la caché y el proveedor externo se
+consulta una vez por sitio en lugar de una vez por escaneo.
+
+La dirección nunca se busca durante la solicitud del escaneo: register_scan anota el
+registro con queue_geocode() y, cuando su transacción se confirma, AddressResolver la
+completa en segundo plano. Las llamadas al proveedor se espacian (la política de
+Nominatim es de una por segundo) y una celda cuya consulta falló no se vuelve a pedir
+hasta pasados GEOCODE_FAILURE_TTL segundos.
+
+Configuración (app.config):
+    GEOCODE_PROVIDER      'nominatim' (por defecto), 'stub' para pruebas o 'none'
+    GEOCODE_GRID_METERS   tamaño aproximado de la celda (50)
+    GEOCODE_TTL_DAYS      días antes de volver a consultar una celda (30)
+    GEOCODE_MAX_ENTRIES   máximo de celdas guardadas; se borran las más antiguas (10000)
+    GEOCODE_USER_AGENT    identificación exigida por Nominatim
+    GEOCODE_TIMEOUT       segundos de espera al proveedor (3)
+    GEOCODE_MIN_INTERVAL  segundos mínimos entre dos llamadas al proveedor (1)
+    GEOCODE_FAILURE_TTL   segundos sin reintentar una celda que falló (300)
+    GEOCODE_QUEUE_SIZE    registros en espera de dirección; si se llena se omiten (10000)
+"""
+import json
+import os
+import queue
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import LRUCache
+from counters import touch_date
+from daily_summary import refresh_daily_summary
+from extensions import dialect_insert
+from models import db, Attendance, GeocodeCache
+
+# Metros por grado de latitud (aproximación suficiente para agrupar escaneos de un sitio)
+METERS_PER_DEGREE = 111320
+
+DEFAULTS = {
+    'GEOCODE_PROVIDER': 'nominatim',
+    'GEOCODE_GRID_METERS': 50,
+    'GEOCODE_TTL_DAYS': 30,
+    'GEOCODE_MAX_ENTRIES': 10000,
+    'GEOCODE_USER_AGENT': 'Sistema_Asistencia/1.0',
+    'GEOCODE_TIMEOUT': 3,
+    'GEOCODE_MIN_INTERVAL': 1,
+    'GEOCODE_FAILURE_TTL': 300,
+    'GEOCODE_QUEUE_SIZE': 10000,
+}
+# Registros que el hilo resuelve y guarda juntos
+GEOCODE_BATCH = 50
+
+
+def _config(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+class NominatimProvider:
+    """Consulta la API pública de OpenStreetMap Nominatim."""
+
+    url = 'https://nominatim.openstreetmap.org/reverse'
+
+    def __init__(self, user_agent, timeout):
+        self.user_agent = user_agent
+        self.timeout = timeout
+
+    def reverse(self, latitude, longitude):
+        query = urllib.parse.urlencode({'format': 'json', 'lat': latitude, 'lon': longitude})
+        request = urllib.request.Request(f"{self.url}?{query}", headers={'User-Agent': self.user_agent})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response).get('display_name') or None
+
+
+class StubProvider:
+    """Proveedor local sin red para pruebas: devuelve las coordenadas como texto."""
+
+    def __init__(self, user_agent=None, timeout=None):
+        self.calls = 0
+
+    def reverse(self, latitude, longitude):
+        self.calls += 1
+        return f"Ubicación {latitude:.5f}, {longitude:.5f}"
+
+
+PROVIDERS = {
+    'nominatim': NominatimProvider,
+    'stub': StubProvider,
+}
+
+_providers = {}
+
+
+def get_provider():
+    """Instancia del proveedor configurado (una por nombre), o None si está deshabilitado."""
+    name = _config('GEOCODE_PROVIDER')
+    if name not in PROVIDERS:
+        return None
+    if name not in _providers:
+        _providers[name] = PROVIDERS[name](_config('GEOCODE_USER_AGENT'), _config('GEOCODE_TIMEOUT'))
+    return _providers[name]
+
+
+def grid_cell(latitude, longitude):
+    """Celda de la cuadrícula: (tamaño en millonésimas de grado, clave de latitud, clave de longitud)."""
+    grid = max(1, round(_config('GEOCODE_GRID_METERS') / METERS_PER_DEGREE * 1e6))
+    return grid, round(latitude * 1e6 / grid), round(longitude * 1e6 / grid)
+
+
+def _store(cell, address, now):
+    """Guarda o renueva la dirección de una celda y borra las más antiguas si se supera el máximo."""
+    grid, lat_key, lon_key = cell
+    values = {'address': address[:255], 'created_at': now}
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(GeocodeCache).values(grid=grid, lat_key=lat_key, lon_key=lon_key, **values)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['grid', 'lat_key', 'lon_key'], set_=values))
+    else:
+        updated = db.session.execute(db.update(GeocodeCache).where(
+            GeocodeCache.grid == grid, GeocodeCache.lat_key == lat_key, GeocodeCache.lon_key == lon_key
+        ).values(**values))
+        if updated.rowcount == 0:
+            db.session.add(GeocodeCache(grid=grid, lat_key=lat_key, lon_key=lon_key, **values))
+
+    excess = db.session.execute(db.select(db.func.count(GeocodeCache.id))).scalar() - _config('GEOCODE_MAX_ENTRIES')
+    if excess > 0:
+        oldest = db.select(GeocodeCache.id).order_by(GeocodeCache.created_at).limit(excess)
+        db.session.execute(db.delete(GeocodeCache).where(GeocodeCache.id.in_(oldest.scalar_subquery())))
+
+
+class Throttle:
+    """Espacia las llamadas: cada una espera hasta `interval` segundos después de la anterior."""
+
+    def __init__(self):
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, interval):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+_throttle = Throttle()
+# Celdas cuya consulta falló, con el momento (time.monotonic) en que se pueden reintentar
+_failed_cells = LRUCache(10000)
+
+
+def lookup_address(cell, latitude, longitude, now=None):
+    """
+    Dirección de unas coordenadas, desde la caché o el proveedor. Devuelve (dirección,
+    nueva): nueva es True si salió del proveedor y hay que guardarla con _store. La
+    dirección es None si no hay proveedor o si falla; en ese caso la celda no se vuelve a
+    consultar por GEOCODE_FAILURE_TTL segundos. Solo lee la base de datos.
+    """
+    now = now or datetime.utcnow()
+    cached = db.session.execute(db.select(GeocodeCache.address, GeocodeCache.created_at).where(
+        GeocodeCache.grid == cell[0], GeocodeCache.lat_key == cell[1], GeocodeCache.lon_key == cell[2]
+    )).first()
+    if cached and cached.created_at > now - timedelta(days=_config('GEOCODE_TTL_DAYS')):
+        return cached.address, False
+
+    provider = get_provider()
+    retry_at = _failed_cells.get(cell)
+    if provider is None or (retry_at is not None and retry_at > time.monotonic()):
+        # Si la entrada venció pero no se puede consultar, es mejor una dirección vieja que ninguna
+        return (cached.address if cached else None), False
+    _throttle.wait(_config('GEOCODE_MIN_INTERVAL'))
+    try:
+        address = provider.reverse(latitude, longitude)
+    except Exception as e:
+        current_app.logger.warning(f"Geocodificación fallida para {latitude}, {longitude}: {e}")
+        _failed_cells.set(cell, time.monotonic() + _config('GEOCODE_FAILURE_TTL'))
+        return (cached.address if cached else None), False
+    if not address:
+        _failed_cells.set(cell, time.monotonic() + _config('GEOCODE_FAILURE_TTL'))
+        return (cached.address if cached else None), False
+    return address, True
+
+
+def apply_addresses(addresses, new_cells, now):
+    """
+    Guarda las celdas nuevas en la caché y la dirección de cada registro que todavía no
+    la tenga, y actualiza sus resúmenes diarios. addresses es una lista de
+    (attendance_id, dirección); new_cells, {celda: dirección}. No hace commit.
+    """
+    for cell, address in new_cells.items():
+        _store(cell, address, now)
+    by_id = dict(addresses)
+    rows = db.session.execute(db.select(Attendance.id, Attendance.employee_id, Attendance.date).where(
+        Attendance.id.in_(by_id), Attendance.address.is_(None))).all()
+    for row in rows:
+        db.session.execute(db.update(Attendance).where(Attendance.id == row.id).values(address=by_id[row.id]))
+    for employee_id, day in {(row.employee_id, row.date) for row in rows}:
+        refresh_daily_summary(employee_id, day)
+    for day in {row.date for row in rows}:
+        touch_date(day)
+    return len(rows)
+
+
+def queue_geocode(session, attendance_id):
+    """Anota un registro para completar su dirección cuando la transacción de la sesión se confirme."""
+    session.info.setdefault('pending_geocodes', []).append(attendance_id)
+
+
+_resolver = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_pending(session):
+    # También se llama al liberar un savepoint (ej. en el escritor agrupado): se espera al commit real
+    if session.in_nested_transaction():
+        return
+    attendance_ids = session.info.pop('pending_geocodes', None)
+    if attendance_ids and _resolver is not None:
+        _resolver.enqueue(attendance_ids)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    # Un id de un savepoint deshecho puede quedar anotado: el hilo lo ignora si no existe
+    if not previous_transaction.nested:
+        session.info.pop('pending_geocodes', None)
+
+
+class AddressResolver:
+    """
+    Hilo por proceso que completa la dirección de los registros anotados con
+    queue_geocode. Resuelve cada grupo solo con lecturas y llamadas al proveedor, y
+    guarda el grupo en un commit a través del escritor de commit agrupado (el mismo que
+    guarda los escaneos, así no compiten por el bloqueo de escritura de SQLite).
+    """
+
+    def __init__(self, app, writer):
+        global _resolver
+        self.app = app
+        self.writer = writer
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        _resolver = self
+
+    def _ensure_started(self):
+        """Arranca el hilo en el primer uso de cada proceso (los workers creados con fork no lo heredan)."""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.app.config.get('GEOCODE_QUEUE_SIZE', DEFAULTS['GEOCODE_QUEUE_SIZE']))
+            self._thread = threading.Thread(target=self._run, name='geocode-resolver', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def enqueue(self, attendance_ids):
+        self._ensure_started()
+        for attendance_id in attendance_ids:
+            try:
+                self._queue.put_nowait(attendance_id)
+            except queue.Full:
+                self.app.logger.warning('Cola de geocodificación llena: registros sin dirección')
+                return
+
+    def join(self):
+        """Espera a que se procesen los registros encolados (para scripts y pruebas)."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def _next_batch(self):
+        ids = [self._queue.get()]
+        while len(ids) < GEOCODE_BATCH:
+            try:
+                ids.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return ids
+
+    def _run(self):
+        while True:
+            ids = self._next_batch()
+            try:
+                with self.app.app_context():
+                    self._resolve(ids)
+            except Exception:
+                self.app.logger.exception('Error al completar direcciones de asistencia')
+            finally:
+                for _ in ids:
+                    self._queue.task_done()
+
+    def _resolve(self, ids):
+        rows = db.session.execute(db.select(Attendance.id, Attendance.latitude, Attendance.longitude).where(
+            Attendance.id.in_(ids), Attendance.address.is_(None),
+            Attendance.latitude.is_not(None), Attendance.longitude.is_not(None))).all()
+        now = datetime.utcnow()
+        resolved, addresses = {}, []
+        for row in rows:
+            cell = grid_cell(row.latitude, row.longitude)
+            if cell not in resolved:
+                resolved[cell] = lookup_address(cell, row.latitude, row.longitude, now)
+            address = resolved[cell][0]
+            if address:
+                addresses.append((row.id, address[:255]))
+        # Se termina la lectura antes de escribir: las escrituras van por el escritor
+        db.session.rollback()
+        if addresses:
+            new_cells = {cell: address for cell, (address, new) in resolved.items() if new}
+            self.writer.execute(apply_addresses, addresses, new_cells, now)
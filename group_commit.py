@@ -0,0 +1,156 @@
+"""
+Escritor único con commit agrupado (group commit) para los registros de asistencia.
+
+En lugar de que cada solicitud haga su propio commit (un fsync por escaneo y todas
+compitiendo por el bloqueo de escritura de SQLite), las solicitudes encolan una
+función y esperan su resultado. Un hilo escritor por proceso toma todo lo que haya
+en la cola, ejecuta cada función en su propio SAVEPOINT y confirma el grupo con un
+solo commit. Si una función falla solo se deshace su savepoint y solo su solicitud
+recibe el error; el resto del grupo se confirma igual.
+
+Configuración (app.config):
+    GROUP_COMMIT_ENABLED    False ejecuta cada función en la solicitud con su propio commit
+    GROUP_COMMIT_MAX_BATCH  máximo de funciones por commit (200)
+    GROUP_COMMIT_TIMEOUT    segundos que espera una solicitud a que su función empiece, y
+                            luego a que se confirme (10)
+"""
+import os
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError
+
+from models import db
+
+DEFAULTS = {
+    'GROUP_COMMIT_ENABLED': True,
+    'GROUP_COMMIT_MAX_BATCH': 200,
+    'GROUP_COMMIT_TIMEOUT': 10,
+}
+
+WriteJob = namedtuple('WriteJob', ['func', 'args', 'kwargs', 'future'])
+
+
+class WriterBusyError(Exception):
+    """
+    La función no terminó dentro del tiempo de espera. Si no había empezado se canceló y
+    no se guardó nada; si ya estaba en curso puede confirmarse después.
+    """
+
+
+class GroupCommitWriter:
+    """Cola de escrituras atendida por un hilo que confirma en grupo."""
+
+    def __init__(self, app):
+        self.app = app
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _config(self, name):
+        return self.app.config.get(name, DEFAULTS[name])
+
+    def _ensure_started(self):
+        """Arranca el hilo en el primer uso de cada proceso (los workers creados con fork no lo heredan)."""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Encola func(*args, **kwargs) y devuelve un Future con su resultado, disponible
+        una vez confirmado el commit del grupo.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put(WriteJob(func, args, kwargs, future))
+        return future
+
+    def execute(self, func, *args, **kwargs):
+        """
+        Ejecuta func dentro de una transacción confirmada y devuelve su resultado, o
+        propaga su excepción. Lanza WriterBusyError si la cola no la atendió a tiempo.
+        """
+        if not self._config('GROUP_COMMIT_ENABLED'):
+            if not db.session().in_transaction():
+                # Como en el escritor: el bloqueo de escritura se toma antes de leer
+                db.session.connection(execution_options={'sqlite_immediate': True})
+            try:
+                result = func(*args, **kwargs)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return result
+
+        future = self.submit(func, *args, **kwargs)
+        timeout = self._config('GROUP_COMMIT_TIMEOUT')
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # Si todavía no empezó se cancela y no se guarda nada
+            if future.cancel():
+                raise WriterBusyError('El servidor está ocupado; intente de nuevo')
+        # Ya está en curso: se espera su commit, también con límite, para no retener la solicitud
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise WriterBusyError('El servidor está tardando en guardar; intente de nuevo') from None
+
+    def _next_batch(self):
+        """Bloquea hasta tener una función y luego toma las que ya esperan, hasta el máximo."""
+        jobs = [self._queue.get()]
+        max_batch = self._config('GROUP_COMMIT_MAX_BATCH')
+        while len(jobs) < max_batch:
+            try:
+                jobs.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return [job for job in jobs if job.future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            jobs = self._next_batch()
+            if not jobs:
+                continue
+            try:
+                with self.app.app_context():
+                    self._commit_batch(jobs)
+            except Exception as e:
+                # Error fuera de las funciones (ej. al abrir la sesión): nadie del grupo queda guardado
+                self.app.logger.exception('Error en el escritor de commit agrupado')
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    def _commit_batch(self, jobs):
+        # En SQLite el grupo toma el bloqueo de escritura al empezar (BEGIN IMMEDIATE)
+        db.session.connection(execution_options={'sqlite_immediate': True})
+        done = []
+        for job in jobs:
+            try:
+                # Al deshacer el savepoint se descarta todo lo de la función, también sus eventos
+                with db.session.begin_nested():
+                    result = job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                job.future.set_exception(e)
+            else:
+                done.append((job, result))
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for job, _ in done:
+                job.future.set_exception(e)
+            return
+        for job, result in done:
+            job.future.set_result(result)
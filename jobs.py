@@ -0,0 +1,244 @@
+"""
+Exportaciones PDF/Excel en segundo plano.
+
+La solicitud solo crea (o reutiliza) una fila de ExportJob, encola su generación en un
+pool de hilos del proceso y responde enseguida. El cliente consulta el estado, con el
+porcentaje de avance, y descarga el archivo cuando está listo.
+
+Solicitudes iguales (mismo formato, rango y empleado, con la misma versión de los datos
+del rango; ver counters.get_range_revision) comparten el trabajo: mientras se genera y
+después, mientras su archivo no venza. Si los datos del rango cambian, la versión es
+otra y se genera un archivo nuevo.
+
+Los trabajos terminados (bien o con error) vencen a los EXPORT_JOB_TTL segundos y
+expire() borra sus filas y archivos; se llama al crear trabajos. Un trabajo sin avance
+durante EXPORT_JOB_STALE segundos (ej. se reinició el proceso que lo generaba) se da por
+perdido: se informa como error y una solicitud igual lo reemplaza.
+
+Configuración (app.config):
+    EXPORT_JOB_DIR      carpeta de los archivos (instance/exports)
+    EXPORT_JOB_WORKERS  exportaciones simultáneas por proceso (2)
+    EXPORT_JOB_TTL      segundos que se conserva un trabajo terminado (3600)
+    EXPORT_JOB_STALE    segundos sin avance para dar un trabajo por perdido (1800)
+"""
+import hashlib
+import os
+import secrets
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Employee, ExportJob
+from counters import get_range_revision
+
+DEFAULTS = {
+    'EXPORT_JOB_WORKERS': 2,
+    'EXPORT_JOB_TTL': 3600,
+    'EXPORT_JOB_STALE': 1800,
+}
+
+PENDING = 'pendiente'
+RUNNING = 'en_proceso'
+DONE = 'listo'
+FAILED = 'error'
+
+# Puntos porcentuales mínimos entre dos actualizaciones del avance (cada una es un commit)
+PROGRESS_STEP = 5
+
+ExportParams = namedtuple('ExportParams', ['export_format', 'start_date', 'end_date', 'employee_id'])
+ExportFormat = namedtuple('ExportFormat', ['extension', 'mimetype', 'download_name', 'write'])
+
+
+def _write_pdf(fileobj, params, progress):
+    from exports import write_pdf_report
+    employee_name = None
+    if params.employee_id:
+        employee = Employee.query.filter_by(employee_id=params.employee_id).first()
+        employee_name = employee.full_name if employee else None
+    write_pdf_report(fileobj, params.start_date, params.end_date, params.employee_id, employee_name, progress)
+
+
+def _write_excel(fileobj, params, progress):
+    from exports import write_excel_report
+    write_excel_report(fileobj, params.start_date, params.end_date, params.employee_id, progress)
+
+
+EXPORT_FORMATS = {
+    'pdf': ExportFormat('pdf', 'application/pdf', 'reporte_asistencia.pdf', _write_pdf),
+    'excel': ExportFormat('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                          'reporte_asistencia.xlsx', _write_excel),
+}
+
+
+def params_key(params, revision):
+    """Clave de deduplicación: la misma exportación sobre la misma versión de los datos."""
+    raw = '|'.join([params.export_format, params.start_date.isoformat(), params.end_date.isoformat(),
+                    params.employee_id or '', ':'.join(str(value) for value in revision)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _remove_file(path):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ExportJobRunner:
+    """Crea los trabajos de exportación y los genera en un pool de hilos por proceso."""
+
+    def __init__(self, app):
+        self.app = app
+        self._pid = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _config(self, name):
+        return self.app.config.get(name, DEFAULTS[name])
+
+    @property
+    def directory(self):
+        return self.app.config.get('EXPORT_JOB_DIR') or os.path.join(self.app.instance_path, 'exports')
+
+    def _get_executor(self):
+        """Crea el pool en el primer uso de cada proceso (los workers creados con fork no heredan sus hilos)."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self._config('EXPORT_JOB_WORKERS'),
+                                                        thread_name_prefix='export-job')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def is_stale(self, job, now=None):
+        """True si el trabajo sigue pendiente o en proceso pero no avanza hace EXPORT_JOB_STALE segundos."""
+        now = now or datetime.utcnow()
+        return (job.status in (PENDING, RUNNING)
+                and job.updated_at < now - timedelta(seconds=self._config('EXPORT_JOB_STALE')))
+
+    def _is_reusable(self, job, now):
+        if job.status in (PENDING, RUNNING):
+            return not self.is_stale(job, now)
+        if job.status == DONE:
+            return job.expires_at > now and os.path.exists(job.file_path)
+        return False
+
+    def submit(self, export_format, start_date, end_date, employee_id=None):
+        """
+        Devuelve el trabajo de la exportación pedida: uno igual en curso o con su archivo
+        vigente, o uno nuevo ya encolado. Los trabajos con error no se reutilizan.
+        """
+        self.expire()
+        params = ExportParams(export_format, start_date, end_date, employee_id or None)
+        key = params_key(params, get_range_revision(start_date, end_date))
+        now = datetime.utcnow()
+
+        previous = ExportJob.query.filter_by(params_key=key).first()
+        previous_file = None
+        if previous is not None:
+            if self._is_reusable(previous, now):
+                return previous
+            # Con error o perdido: se reemplaza (si otra solicitud ya lo borró no pasa nada)
+            previous_file = previous.file_path
+            db.session.execute(db.delete(ExportJob).where(ExportJob.id == previous.id))
+
+        job = ExportJob(token=secrets.token_hex(16), params_key=key, export_format=export_format,
+                        start_date=start_date, end_date=end_date, employee_id=params.employee_id,
+                        status=PENDING, progress=0, created_at=now, updated_at=now)
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Otra solicitud igual creó el trabajo al mismo tiempo: se usa el suyo
+            db.session.rollback()
+            existing = ExportJob.query.filter_by(params_key=key).first()
+            if existing is None:
+                raise
+            return existing
+        _remove_file(previous_file)
+
+        self._get_executor().submit(self._run, job.id, job.token, params)
+        return job
+
+    def expire(self, now=None):
+        """Borra los trabajos vencidos o perdidos y sus archivos. Devuelve cuántos borró."""
+        now = now or datetime.utcnow()
+        stale_before = now - timedelta(seconds=self._config('EXPORT_JOB_STALE'))
+        rows = db.session.execute(db.select(ExportJob.id, ExportJob.file_path).where(db.or_(
+            ExportJob.expires_at < now,
+            db.and_(ExportJob.status.in_((PENDING, RUNNING)), ExportJob.updated_at < stale_before),
+        ))).all()
+        if not rows:
+            return 0
+        db.session.execute(db.delete(ExportJob).where(ExportJob.id.in_([row.id for row in rows])))
+        db.session.commit()
+        for row in rows:
+            _remove_file(row.file_path)
+        return len(rows)
+
+    def _update(self, job_id, **values):
+        """
+        Actualiza el trabajo en una transacción propia, en otra conexión: la sesión del hilo
+        sigue leyendo el reporte, y en SQLite pasar esa lectura a escritura falla si otro
+        commit llegó mientras tanto. Devuelve False si el trabajo ya no existe (venció o
+        fue reemplazado).
+        """
+        values['updated_at'] = datetime.utcnow()
+        with db.engine.begin() as connection:
+            result = connection.execute(db.update(ExportJob).where(ExportJob.id == job_id).values(**values))
+        return result.rowcount > 0
+
+    def _run(self, job_id, token, params):
+        try:
+            with self.app.app_context():
+                self._generate(job_id, token, params)
+        except Exception:
+            self.app.logger.exception('Error en el trabajo de exportación %s', token)
+
+    def _generate(self, job_id, token, params):
+        if not self._update(job_id, status=RUNNING):
+            return
+        export = EXPORT_FORMATS[params.export_format]
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{token}.{export.extension}")
+        # Se escribe en un archivo temporal: una descarga nunca ve un archivo a medias
+        tmp_path = path + '.tmp'
+        reported = [0]
+
+        def progress(fraction):
+            percent = min(99, int(fraction * 100))
+            if percent - reported[0] >= PROGRESS_STEP:
+                reported[0] = percent
+                self._update(job_id, progress=percent)
+
+        try:
+            with open(tmp_path, 'wb') as fileobj:
+                export.write(fileobj, params, progress)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            db.session.rollback()
+            _remove_file(tmp_path)
+            self.app.logger.exception('Error al generar la exportación %s', token)
+            expires_at = datetime.utcnow() + timedelta(seconds=self._config('EXPORT_JOB_TTL'))
+            self._update(job_id, status=FAILED, error=str(e)[:255], expires_at=expires_at)
+            return
+
+        expires_at = datetime.utcnow() + timedelta(seconds=self._config('EXPORT_JOB_TTL'))
+        if not self._update(job_id, status=DONE, progress=100, file_path=path, expires_at=expires_at):
+            _remove_file(path)
+
+    def status(self, job):
+        """Estado del trabajo para la respuesta JSON (sin las URLs, que agrega la ruta)."""
+        status = {'id': job.token, 'format': job.export_format, 'status': job.status, 'progress': job.progress}
+        if self.is_stale(job):
+            status.update(status=FAILED, error='La exportación se interrumpió; vuelva a solicitarla')
+        elif job.status == FAILED:
+            status['error'] = job.error
+        elif job.status == DONE:
+            status['expires_at'] = job.expires_at.isoformat()
+        return status
@@ -0,0 +1,30 @@
+"""add composite indexes to attendance
+
+Revision ID: 3f9c2a7d1e84
+Revises: 5ad0827b2607
+Create Date: 2026-10-18 09:12:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1e84'
+down_revision = '5ad0827b2607'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Conteos del dashboard: WHERE date = ? AND attendance_type = ? [AND is_late = ?]
+    op.create_index('ix_attendance_date_type_late', 'attendance',
+                    ['date', 'attendance_type', 'is_late'], unique=False)
+    # Validación de cada escaneo: WHERE employee_id = ? AND date = ? AND attendance_type = ?
+    op.create_index('ix_attendance_employee_date_type', 'attendance',
+                    ['employee_id', 'date', 'attendance_type'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_attendance_employee_date_type', table_name='attendance')
+    op.drop_index('ix_attendance_date_type_late', table_name='attendance')
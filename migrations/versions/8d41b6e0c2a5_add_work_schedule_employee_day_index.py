@@ -0,0 +1,26 @@
+"""add employee/day index to work_schedule
+
+Revision ID: 8d41b6e0c2a5
+Revises: 3f9c2a7d1e84
+Create Date: 2026-10-18 10:03:17.220941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6e0c2a5'
+down_revision = '3f9c2a7d1e84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Horario del día consultado en cada escaneo: WHERE employee_id = ? AND day_of_week = ?
+    op.create_index('ix_work_schedule_employee_day', 'work_schedule',
+                    ['employee_id', 'day_of_week'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_work_schedule_employee_day', table_name='work_schedule')
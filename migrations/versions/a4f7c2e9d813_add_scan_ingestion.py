@@ -0,0 +1,38 @@
+"""add scan_ingestion table
+
+Revision ID: a4f7c2e9d813
+Revises: e2b8d4c61f37
+Create Date: 2026-10-18 15:22:40.183529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f7c2e9d813'
+down_revision = 'e2b8d4c61f37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scan_ingestion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+    sa.Column('employee_id', sa.String(length=20), nullable=False),
+    sa.Column('client_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('attendance_id', sa.Integer(), nullable=True),
+    sa.Column('success', sa.Boolean(), nullable=False),
+    sa.Column('message', sa.String(length=255), nullable=False),
+    sa.Column('attendance_type', sa.String(length=10), nullable=True),
+    sa.Column('is_late', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['attendance_id'], ['attendance.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+
+
+def downgrade():
+    op.drop_table('scan_ingestion')
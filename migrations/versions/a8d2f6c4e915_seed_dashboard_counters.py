@@ -0,0 +1,44 @@
+"""seed dashboard counters
+
+Revision ID: a8d2f6c4e915
+Revises: f3c9b2e4a718
+Create Date: 2026-10-18 22:05:31.640218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d2f6c4e915'
+down_revision = 'f3c9b2e4a718'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # El dashboard ya no reconstruye los contadores al leerlos: se calculan aquí una vez
+    # (igual que rebuild_counters) y desde entonces los mantienen los registros y altas.
+    # 'empleados_activos' se crea siempre, aunque valga 0, para que los incrementos
+    # posteriores sumen sobre el total real.
+    op.execute("DELETE FROM dashboard_counter WHERE name = 'empleados_activos'"
+               " OR name LIKE 'entradas:%' OR name LIKE 'tarde:%'")
+    op.execute(sa.text(
+        "INSERT INTO dashboard_counter (name, value)"
+        " SELECT 'empleados_activos', COUNT(id) FROM employee WHERE is_active = :true"
+    ).bindparams(true=True))
+    op.execute(
+        "INSERT INTO dashboard_counter (name, value)"
+        " SELECT 'entradas:' || CAST(date AS VARCHAR), COUNT(id) FROM attendance"
+        " WHERE attendance_type = 'entrada' AND date IS NOT NULL GROUP BY date"
+    )
+    op.execute(sa.text(
+        "INSERT INTO dashboard_counter (name, value)"
+        " SELECT 'tarde:' || CAST(date AS VARCHAR), COUNT(id) FROM attendance"
+        " WHERE attendance_type = 'entrada' AND is_late = :true AND date IS NOT NULL GROUP BY date"
+    ).bindparams(true=True))
+
+
+def downgrade():
+    # Los contadores son datos derivados: no hay nada que deshacer
+    pass
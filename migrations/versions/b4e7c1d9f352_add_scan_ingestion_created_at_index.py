@@ -0,0 +1,25 @@
+"""add created_at index to scan_ingestion
+
+Revision ID: b4e7c1d9f352
+Revises: a8d2f6c4e915
+Create Date: 2026-10-18 22:48:13.905127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e7c1d9f352'
+down_revision = 'a8d2f6c4e915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Limpieza periódica de los resultados de escaneos más antiguos que la retención
+    op.create_index('ix_scan_ingestion_created_at', 'scan_ingestion', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_scan_ingestion_created_at', table_name='scan_ingestion')
@@ -0,0 +1,38 @@
+"""add geocode_cache table
+
+Revision ID: b91e6d3a7c54
+Revises: a4f7c2e9d813
+Create Date: 2026-10-18 16:05:11.402871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b91e6d3a7c54'
+down_revision = 'a4f7c2e9d813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('geocode_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('grid', sa.Integer(), nullable=False),
+    sa.Column('lat_key', sa.Integer(), nullable=False),
+    sa.Column('lon_key', sa.Integer(), nullable=False),
+    sa.Column('address', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('grid', 'lat_key', 'lon_key', name='uq_geocode_cache_cell')
+    )
+    with op.batch_alter_table('geocode_cache', schema=None) as batch_op:
+        batch_op.create_index('ix_geocode_cache_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('geocode_cache', schema=None) as batch_op:
+        batch_op.drop_index('ix_geocode_cache_created_at')
+
+    op.drop_table('geocode_cache')
@@ -0,0 +1,36 @@
+"""add live_event table
+
+Revision ID: c6f1a9d3b508
+Revises: b4e7c1d9f352
+Create Date: 2026-10-19 10:12:40.318265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a9d3b508'
+down_revision = 'b4e7c1d9f352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('live_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('live_event', schema=None) as batch_op:
+        batch_op.create_index('ix_live_event_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('live_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_live_event_created_at')
+
+    op.drop_table('live_event')
@@ -0,0 +1,29 @@
+"""add dashboard_counter table
+
+Revision ID: c7e5a3f19b02
+Revises: 8d41b6e0c2a5
+Create Date: 2026-10-18 11:26:52.943107
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e5a3f19b02'
+down_revision = '8d41b6e0c2a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los valores los calcula la migración a8d2f6c4e915 (o rebuild_counters.py)
+    op.create_table('dashboard_counter',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('dashboard_counter')
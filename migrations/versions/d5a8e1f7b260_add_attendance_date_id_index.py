@@ -0,0 +1,25 @@
+"""add date/id index to attendance
+
+Revision ID: d5a8e1f7b260
+Revises: b91e6d3a7c54
+Create Date: 2026-10-18 18:12:40.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a8e1f7b260'
+down_revision = 'b91e6d3a7c54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Feed del escáner: WHERE date = ? AND id > ? ORDER BY id, sin ordenar los registros del día
+    op.create_index('ix_attendance_date_id', 'attendance', ['date', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_attendance_date_id', table_name='attendance')
@@ -0,0 +1,67 @@
+"""add daily_attendance_summary table
+
+Revision ID: e2b8d4c61f37
+Revises: c7e5a3f19b02
+Create Date: 2026-10-18 13:04:18.512337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8d4c61f37'
+down_revision = 'c7e5a3f19b02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_attendance_summary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.String(length=20), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('entrada_id', sa.Integer(), nullable=True),
+    sa.Column('entrada_time', sa.DateTime(), nullable=True),
+    sa.Column('salida_time', sa.DateTime(), nullable=True),
+    sa.Column('address', sa.String(length=255), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employee.employee_id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('employee_id', 'date', name='uq_daily_summary_employee_date')
+    )
+    with op.batch_alter_table('daily_attendance_summary', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_summary_date', ['date'], unique=False)
+
+    # Carga inicial desde el historial (lo mismo que backfill_daily_summary.py)
+    op.execute("""
+        INSERT INTO daily_attendance_summary (employee_id, date, entrada_time, salida_time)
+        SELECT employee_id, date,
+               MIN(CASE WHEN attendance_type = 'entrada' THEN timestamp END),
+               MAX(CASE WHEN attendance_type = 'salida' THEN timestamp END)
+        FROM attendance
+        GROUP BY employee_id, date
+    """)
+    op.execute("""
+        UPDATE daily_attendance_summary SET entrada_id = (
+            SELECT MIN(a.id) FROM attendance a
+            WHERE a.employee_id = daily_attendance_summary.employee_id
+              AND a.date = daily_attendance_summary.date
+              AND a.attendance_type = 'entrada'
+              AND a.timestamp = daily_attendance_summary.entrada_time)
+    """)
+    op.execute("""
+        UPDATE daily_attendance_summary SET
+            address = (SELECT a.address FROM attendance a WHERE a.id = daily_attendance_summary.entrada_id),
+            latitude = (SELECT a.latitude FROM attendance a WHERE a.id = daily_attendance_summary.entrada_id),
+            longitude = (SELECT a.longitude FROM attendance a WHERE a.id = daily_attendance_summary.entrada_id)
+        WHERE entrada_id IS NOT NULL
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_attendance_summary', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_summary_date')
+
+    op.drop_table('daily_attendance_summary')
@@ -0,0 +1,47 @@
+"""add export_job table
+
+Revision ID: f3c9b2e4a718
+Revises: d5a8e1f7b260
+Create Date: 2026-10-18 20:41:07.215934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9b2e4a718'
+down_revision = 'd5a8e1f7b260'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('export_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=32), nullable=False),
+    sa.Column('params_key', sa.String(length=64), nullable=False),
+    sa.Column('export_format', sa.String(length=10), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.Column('employee_id', sa.String(length=20), nullable=True),
+    sa.Column('status', sa.String(length=12), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=False),
+    sa.Column('file_path', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('params_key'),
+    sa.UniqueConstraint('token')
+    )
+    with op.batch_alter_table('export_job', schema=None) as batch_op:
+        batch_op.create_index('ix_export_job_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('export_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_export_job_expires_at')
+
+    op.drop_table('export_job')
@@ -57,6 +57,13 @@ class Attendance(db.Model):
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
     address = db.Column(db.String(255), nullable=True)  # Dirección legible
+
+    # Índices para los conteos del dashboard, la validación de cada escaneo y el feed del escáner
+    __table_args__ = (
+        db.Index('ix_attendance_date_type_late', 'date', 'attendance_type', 'is_late'),
+        db.Index('ix_attendance_employee_date_type', 'employee_id', 'date', 'attendance_type'),
+        db.Index('ix_attendance_date_id', 'date', 'id'),
+    )
     
     def __repr__(self):
         return f'<Attendance {self.employee_id}: {self.attendance_type} at {self.timestamp}>'
@@ -68,7 +75,124 @@ class WorkSchedule(db.Model):
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
+
+    # Búsqueda del horario del día en cada escaneo
+    __table_args__ = (
+        db.Index('ix_work_schedule_employee_day', 'employee_id', 'day_of_week'),
+    )
     
     def __repr__(self):
         return f'<WorkSchedule {self.employee_id}: Day {self.day_of_week}>'
 
+
+class DashboardCounter(db.Model):
+    """Contadores del dashboard mantenidos al registrar asistencias y empleados."""
+    name = db.Column(db.String(50), primary_key=True)  # ej. 'empleados_activos', 'entradas:2025-07-25'
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DashboardCounter {self.name}={self.value}>'
+
+class DailyAttendanceSummary(db.Model):
+    """Resumen por empleado y día: primera entrada y última salida, mantenido al registrar o editar."""
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.String(20), db.ForeignKey('employee.employee_id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    entrada_id = db.Column(db.Integer, nullable=True)  # Attendance.id de la primera entrada (para edición)
+    entrada_time = db.Column(db.DateTime, nullable=True)
+    salida_time = db.Column(db.DateTime, nullable=True)
+    address = db.Column(db.String(255), nullable=True)  # Datos de la primera entrada
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date', name='uq_daily_summary_employee_date'),
+        db.Index('ix_daily_summary_date', 'date'),
+    )
+
+    def __repr__(self):
+        return f'<DailyAttendanceSummary {self.employee_id} {self.date}>'
+
+class LiveEvent(db.Model):
+    """Evento en vivo para /events, compartido por todos los workers (ver events.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(20), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_live_event_created_at', 'created_at'),  # Limpieza de eventos antiguos
+        # Los ids no se reutilizan aunque se borren todas las filas: los clientes recuerdan el último
+        {'sqlite_autoincrement': True},
+    )
+
+class ScanIngestion(db.Model):
+    """Resultado de cada escaneo recibido por lotes, por clave de idempotencia (los reintentos devuelven el mismo)."""
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=False)
+    employee_id = db.Column(db.String(20), nullable=False)
+    client_timestamp = db.Column(db.DateTime, nullable=False)
+    attendance_id = db.Column(db.Integer, db.ForeignKey('attendance.id'), nullable=True)  # None si se rechazó
+    success = db.Column(db.Boolean, nullable=False)
+    message = db.Column(db.String(255), nullable=False)
+    attendance_type = db.Column(db.String(10), nullable=True)
+    is_late = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    attendance = db.relationship('Attendance')
+
+    __table_args__ = (
+        db.Index('ix_scan_ingestion_created_at', 'created_at'),  # Limpieza de resultados antiguos
+    )
+
+    def to_result(self):
+        """Respuesta del escaneo con la misma forma que la de register_scan."""
+        result = {'idempotency_key': self.idempotency_key, 'success': self.success, 'message': self.message}
+        if self.success:
+            result.update(is_late=self.is_late, attendance_type=self.attendance_type)
+        return result
+
+    def __repr__(self):
+        return f'<ScanIngestion {self.idempotency_key}: {self.employee_id}>'
+
+class GeocodeCache(db.Model):
+    """Dirección obtenida por geocodificación inversa para una celda de la cuadrícula de coordenadas."""
+    id = db.Column(db.Integer, primary_key=True)
+    grid = db.Column(db.Integer, nullable=False)  # Tamaño de la celda en millonésimas de grado
+    lat_key = db.Column(db.Integer, nullable=False)  # Latitud y longitud divididas por el tamaño de la celda
+    lon_key = db.Column(db.Integer, nullable=False)
+    address = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('grid', 'lat_key', 'lon_key', name='uq_geocode_cache_cell'),
+        db.Index('ix_geocode_cache_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<GeocodeCache {self.lat_key},{self.lon_key}: {self.address}>'
+
+class ExportJob(db.Model):
+    """Exportación PDF/Excel generada en segundo plano (ver jobs.py); el archivo se borra al vencer."""
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), unique=True, nullable=False)  # Identificador público del trabajo
+    # Hash de formato, rango, empleado y versión de los datos: solicitudes iguales comparten el trabajo
+    params_key = db.Column(db.String(64), unique=True, nullable=False)
+    export_format = db.Column(db.String(10), nullable=False)  # 'pdf' o 'excel'
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    employee_id = db.Column(db.String(20), nullable=True)  # None para el reporte general
+    status = db.Column(db.String(12), nullable=False)  # 'pendiente', 'en_proceso', 'listo' o 'error'
+    progress = db.Column(db.Integer, nullable=False, default=0)  # Porcentaje
+    file_path = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Último avance registrado
+    expires_at = db.Column(db.DateTime, nullable=True)  # Al terminar (bien o con error)
+
+    __table_args__ = (
+        db.Index('ix_export_job_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f'<ExportJob {self.token}: {self.export_format} {self.status}>'
@@ -1,35 +1,184 @@
 import qrcode
 import os
+import io
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, PngImagePlugin
+from cache import LRUCache
 
-def generate_qr_code(data, employee_id, save_dir="./static/qr_codes"):
+# Parámetros de dibujo; si cambian, todos los QR se consideran desactualizados
+QR_RENDER_PARAMS = {
+    'version': 1,
+    'error_correction': qrcode.constants.ERROR_CORRECT_L,
+    'box_size': 10,
+    'border': 4,
+    'fill_color': 'black',
+    'back_color': 'white',
+}
+# Tamaños predefinidos: píxeles por módulo del QR (un QR versión 1 con borde mide 29 módulos)
+QR_TIERS = {
+    'thumbnail': 2,   # ~58 px, listados
+    'screen': 10,     # ~290 px, pantalla y escáner
+    'print': 40,      # ~1160 px, credenciales impresas
+}
+QR_DEFAULT_TIER = 'screen'
+QR_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+# Clave del bloque de texto del PNG (o comentario del SVG) donde se guarda el hash del contenido
+QR_HASH_KEY = 'qr-hash'
+# QR servidos bajo demanda (un PNG de 10 px por módulo pesa ~1 KB): hasta 16 MB en memoria
+_qr_cache = LRUCache(max_entries=20000, max_bytes=16 * 1024 * 1024)
+
+def _render_params(tier):
+    if tier not in QR_TIERS:
+        raise ValueError(f"Tamaño de QR desconocido: {tier}")
+    return dict(QR_RENDER_PARAMS, box_size=QR_TIERS[tier])
+
+def qr_content_hash(data, fmt='png', tier=QR_DEFAULT_TIER):
+    """Hash del contenido de un QR: los datos codificados, el formato y los parámetros de dibujo."""
+    params = ';'.join(f"{key}={value}" for key, value in sorted(_render_params(tier).items()))
+    suffix = '' if fmt == 'png' else f"|{fmt}"
+    return hashlib.sha256(f"{data}|{params}{suffix}".encode('utf-8')).hexdigest()
+
+def qr_filename(employee_id, fmt='png', tier=QR_DEFAULT_TIER):
+    """Nombre del archivo del QR; el PNG de pantalla conserva el nombre histórico qr_<id>.png."""
+    if fmt == 'png' and tier == QR_DEFAULT_TIER:
+        return f"qr_{employee_id}.png"
+    return f"qr_{employee_id}_{tier}.{fmt}"
+
+def read_qr_hash(filepath):
+    """Lee el hash guardado en un archivo de QR, PNG o SVG (None si no existe o no lo tiene)."""
+    try:
+        if filepath.endswith('.svg'):
+            with open(filepath, encoding='utf-8') as f:
+                head = f.read(512)
+            marker = f"<!--{QR_HASH_KEY}:"
+            start = head.find(marker)
+            if start == -1:
+                return None
+            return head[start + len(marker):head.index('-->', start)]
+        with Image.open(filepath) as img:
+            return img.text.get(QR_HASH_KEY)
+    except (OSError, AttributeError, ValueError):
+        return None
+
+def _make_qr(data, params):
+    qr = qrcode.QRCode(
+        version=params['version'],
+        error_correction=params['error_correction'],
+        box_size=params['box_size'],
+        border=params['border'],
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+def _save_qr_png(data, target, tier=QR_DEFAULT_TIER):
+    """Dibuja el QR y lo guarda como PNG (con su hash) en una ruta o en un archivo abierto."""
+    params = _render_params(tier)
+    img = _make_qr(data, params).make_image(fill_color=params['fill_color'], back_color=params['back_color'])
+    info = PngImagePlugin.PngInfo()
+    info.add_text(QR_HASH_KEY, qr_content_hash(data, 'png', tier))
+    img.save(target, format='PNG', pnginfo=info)
+
+def _qr_svg(data, tier=QR_DEFAULT_TIER):
+    """
+    Dibuja el QR como SVG: un solo path con un rectángulo por cada tramo horizontal de
+    módulos oscuros, así pesa unos cientos de bytes y se imprime nítido a cualquier tamaño.
+    El tamaño solo fija el ancho y alto sugeridos en píxeles.
+    """
+    params = _render_params(tier)
+    matrix = _make_qr(data, params).get_matrix()
+    size = len(matrix)
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            runs.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    pixels = size * params['box_size']
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<!--{QR_HASH_KEY}:{qr_content_hash(data, "svg", tier)}-->'
+        f'<rect width="{size}" height="{size}" fill="{params["back_color"]}"/>'
+        f'<path fill="{params["fill_color"]}" d="{"".join(runs)}"/></svg>'
+    )
+
+def render_qr(data, fmt='png', tier=QR_DEFAULT_TIER):
+    """Dibuja el QR en memoria y devuelve sus bytes (PNG o SVG), sin tocar el disco."""
+    if fmt == 'svg':
+        return _qr_svg(data, tier).encode('utf-8')
+    if fmt != 'png':
+        raise ValueError(f"Formato de QR desconocido: {fmt}")
+    buffer = io.BytesIO()
+    _save_qr_png(data, buffer, tier)
+    return buffer.getvalue()
+
+def get_qr_image(data, fmt='png', tier=QR_DEFAULT_TIER):
+    """
+    Devuelve (bytes de la imagen, etag) del QR, usando la caché en memoria.
+    El etag es el hash del contenido, así que no cambia mientras no cambien los datos,
+    el formato ni los parámetros de dibujo.
+    """
+    image = _qr_cache.get_or_create((data, fmt, tier), lambda: render_qr(data, fmt, tier))
+    return image, qr_content_hash(data, fmt, tier)
+
+def generate_qr_code(data, employee_id, save_dir="./static/qr_codes", fmt='png', tier=QR_DEFAULT_TIER):
     """
     Genera un código QR y lo guarda como una imagen.
     :param data: Los datos a codificar en el QR (ej. ID del empleado).
     :param employee_id: ID del empleado para nombrar el archivo.
     :param save_dir: Directorio donde se guardarán los códigos QR.
+    :param fmt: 'png' o 'svg'.
+    :param tier: Tamaño predefinido: 'thumbnail', 'screen' o 'print'.
     :return: La ruta relativa del archivo QR guardado.
     """
     if not os.path.exists(save_dir):
-        os.makedirs(save_dir)
+        os.makedirs(save_dir, exist_ok=True)
 
-    filename = f"qr_{employee_id}.png"
+    filename = qr_filename(employee_id, fmt, tier)
     filepath = os.path.join(save_dir, filename)
 
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-    img.save(filepath)
+    # Escribir a un temporal y reemplazar, para no servir nunca un archivo a medias
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(render_qr(data, fmt, tier))
+    os.replace(tmp_path, filepath)
     
     # Asegurar que la ruta sea compatible con web (solo /)
     return os.path.join(os.path.basename(save_dir), filename).replace('\\', '/')
 
+def ensure_qr_code(data, employee_id, save_dir="./static/qr_codes", fmt='png', tier=QR_DEFAULT_TIER):
+    """
+    Genera el QR solo si el archivo no existe o su hash no coincide con el contenido actual.
+    :return: (ruta relativa, True si se escribió el archivo)
+    """
+    filename = qr_filename(employee_id, fmt, tier)
+    if read_qr_hash(os.path.join(save_dir, filename)) == qr_content_hash(data, fmt, tier):
+        return os.path.join(os.path.basename(save_dir), filename).replace('\\', '/'), False
+    return generate_qr_code(data, employee_id, save_dir, fmt, tier), True
+
+def _ensure_qr_job(job):
+    data, employee_id, save_dir, fmt, tier = job
+    return (employee_id, *ensure_qr_code(data, employee_id, save_dir, fmt, tier))
+
+def generate_qr_codes(items, save_dir="./static/qr_codes", workers=None, chunksize=64, fmt='png', tier=QR_DEFAULT_TIER):
+    """
+    Genera en paralelo (pool de procesos) los QR de una lista de (datos, employee_id),
+    omitiendo los que ya están al día.
+    :return: Lista de (employee_id, ruta relativa, True si se escribió el archivo).
+    """
+    jobs = [(data, employee_id, save_dir, fmt, tier) for data, employee_id in items]
+    if workers == 1 or len(jobs) <= chunksize:
+        return [_ensure_qr_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_ensure_qr_job, jobs, chunksize=chunksize))
+
 if __name__ == '__main__':
     # Ejemplo de uso
     employee_data = "EMP001"
@@ -0,0 +1,203 @@
+"""
+Límite de solicitudes por clave (ej. IP) con ventana deslizante aproximada.
+
+Cada clave guarda solo tres números: el inicio de la ventana fija actual y los conteos
+de la ventana actual y la anterior. El conteo estimado en los últimos N segundos es
+    anterior * (parte de la ventana anterior que sigue dentro) + actual
+así la memoria por clave es fija sin importar cuántas solicitudes haga.
+
+Backends:
+    MemoryBackend   por proceso, con desalojo LRU; para desarrollo o un solo worker.
+    SQLiteBackend   archivo SQLite aparte, compartido por todos los workers del servidor,
+                    con desalojo de las claves inactivas más antiguas.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import jsonify, request
+
+
+class MemoryBackend:
+    """Estados en un OrderedDict por proceso; al superar max_keys sale la clave menos usada."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self
+
+    def get(self, key):
+        state = self._data.get(key)
+        if state is not None:
+            self._data.move_to_end(key)
+        return state
+
+    def put(self, key, state):
+        self._data[key] = state
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+
+class SQLiteBackend:
+    """
+    Estados en una tabla de un archivo SQLite propio (no la base de la aplicación, para no
+    sumar escrituras a la de asistencias). Cada actualización usa BEGIN IMMEDIATE, así
+    dos workers no pueden leer y escribir la misma clave a la vez.
+    """
+
+    def __init__(self, path, max_keys=10000, evict_every=100):
+        self.path = path
+        self.max_keys = max_keys
+        self.evict_every = evict_every
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            " key TEXT PRIMARY KEY, window_start REAL NOT NULL, current INTEGER NOT NULL,"
+            " previous INTEGER NOT NULL, last_seen REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_last_seen ON rate_limit (last_seen)")
+
+    def _connection(self):
+        """
+        Una conexión por hilo y por proceso: las de sqlite3 no se comparten entre hilos
+        ni deben heredarse al crear workers con fork.
+        """
+        pid, conn = getattr(self._local, 'conn', (None, None))
+        if conn is None or pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = (os.getpid(), conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT window_start, current, previous FROM rate_limit WHERE key = ?", (key,)).fetchone()
+        return list(row) if row else None
+
+    def put(self, key, state):
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO rate_limit (key, window_start, current, previous, last_seen) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET window_start = excluded.window_start, current = excluded.current,"
+            " previous = excluded.previous, last_seen = excluded.last_seen",
+            (key, *state, time.time()),
+        )
+        # Desalojo ocasional: se borran las claves sin uso más antiguas que excedan el máximo
+        if random.randrange(self.evict_every) == 0:
+            conn.execute(
+                "DELETE FROM rate_limit WHERE key IN (SELECT key FROM rate_limit ORDER BY last_seen"
+                " LIMIT max(0, (SELECT count(*) FROM rate_limit) - ?))", (self.max_keys,))
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM rate_limit WHERE key = ?", (key,))
+
+
+class RateLimiter:
+    """Permite hasta `limit` eventos por clave en cualquier período de `window` segundos."""
+
+    def __init__(self, name, limit, window, backend):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def _roll(self, state, now):
+        """Lleva el estado (inicio, actual, anterior) a la ventana fija que contiene `now`."""
+        window_start = now - now % self.window
+        if state is None or state[0] < window_start - self.window:
+            return [window_start, 0, 0]
+        if state[0] < window_start:
+            return [window_start, 0, state[1]]
+        return state
+
+    def _estimate(self, state, now):
+        window_start, current, previous = state
+        remaining = 1 - (now - window_start) / self.window
+        return previous * remaining + current
+
+    def is_limited(self, key):
+        """True si la clave ya alcanzó el límite (no cuenta un evento nuevo)."""
+        now = time.time()
+        with self.backend.transaction() as backend:
+            state = self._roll(backend.get(self._key(key)), now)
+        return self._estimate(state, now) >= self.limit
+
+    def hit(self, key, cost=1):
+        """Cuenta `cost` eventos (ej. los escaneos de un lote). Devuelve True si quedaron dentro del límite."""
+        now = time.time()
+        with self.backend.transaction() as backend:
+            state = self._roll(backend.get(self._key(key)), now)
+            if self._estimate(state, now) + cost > self.limit:
+                return False
+            state[1] += cost
+            backend.put(self._key(key), state)
+        return True
+
+    def reset(self, key):
+        with self.backend.transaction() as backend:
+            backend.delete(self._key(key))
+
+
+def create_backend(storage, max_keys=10000):
+    """'memory' para un backend por proceso; cualquier otro valor es la ruta del archivo SQLite."""
+    if storage == 'memory':
+        return MemoryBackend(max_keys)
+    return SQLiteBackend(storage, max_keys)
+
+
+def client_ip():
+    """
+    IP del cliente. Detrás de un proxy, ProxyFix (configurado con TRUSTED_PROXIES) ya la
+    tomó de X-Forwarded-For; la cabecera no se lee aquí porque el cliente puede falsearla.
+    """
+    return request.remote_addr
+
+
+def rate_limited(limiter, key_func=client_ip, cost_func=None):
+    """
+    Decorador de rutas JSON: responde 429 cuando la clave supera el límite. cost_func
+    indica cuántos eventos cuenta la solicitud (1 si no se indica).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not limiter.hit(key_func(), cost_func() if cost_func else 1):
+                response = jsonify({'success': False, 'message': 'Demasiadas solicitudes. Intente de nuevo en un momento.'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(int(limiter.window))
+                return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,14 @@
+from app import app
+from models import db
+from counters import rebuild_counters
+
+# Script para reconstruir los contadores del dashboard desde los registros de asistencia
+
+def rebuild_dashboard_counters():
+    with app.app_context():
+        total = rebuild_counters()
+        db.session.commit()
+        print(f"Contadores del dashboard reconstruidos ({total} claves).")
+
+if __name__ == "__main__":
+    rebuild_dashboard_counters()
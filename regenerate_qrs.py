@@ -1,18 +1,42 @@
+import argparse
+
 from app import app
 from models import db, Employee
-from qr_generator import generate_qr_code
+from counters import increment, EMPLOYEE_EDITS
+from qr_generator import generate_qr_codes, QR_FORMATS, QR_TIERS, QR_DEFAULT_TIER
 
-# Script para regenerar los QR de todos los empleados
+# Script para regenerar los QR de todos los empleados.
+# Los archivos cuyo hash (datos + parámetros de dibujo) coincide no se vuelven a escribir.
+# Uso: python regenerate_qrs.py [--workers N] [--format png|svg] [--size thumbnail|screen|print]
+# Employee.qr_code solo se actualiza con el PNG de pantalla (el formato por defecto).
 
-def regenerate_all_qrs():
+def regenerate_all_qrs(workers=None, fmt='png', tier=QR_DEFAULT_TIER):
     with app.app_context():
-        employees = Employee.query.all()
-        for emp in employees:
-            # Generar y guardar el QR
-            qr_path = generate_qr_code(emp.employee_id, emp.employee_id)
-            emp.qr_code = qr_path
+        employees = db.session.execute(
+            db.select(Employee.id, Employee.employee_id, Employee.qr_code)
+        ).all()
+
+        # Generar los QR en paralelo
+        results = generate_qr_codes([(emp.employee_id, emp.employee_id) for emp in employees],
+                                    workers=workers, fmt=fmt, tier=tier)
+        written = sum(1 for _, _, changed in results if changed)
+
+        # Un solo UPDATE por lotes con las rutas que cambiaron
+        updates = []
+        if fmt == 'png' and tier == QR_DEFAULT_TIER:
+            current = {emp.employee_id: (emp.id, emp.qr_code) for emp in employees}
+            updates = [{'id': current[employee_id][0], 'qr_code': qr_path}
+                       for employee_id, qr_path, _ in results if current[employee_id][1] != qr_path]
+        if updates:
+            db.session.execute(db.update(Employee), updates)
+            increment(EMPLOYEE_EDITS)
         db.session.commit()
-        print("Todos los QR han sido regenerados y actualizados en la base de datos.")
+        print(f"QR revisados: {len(results)}, regenerados: {written}, rutas actualizadas en la base de datos: {len(updates)}.")
 
 if __name__ == "__main__":
-    regenerate_all_qrs()
+    parser = argparse.ArgumentParser(description="Regenera los códigos QR de los empleados.")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para generar los QR (por defecto, uno por CPU)")
+    parser.add_argument('--format', choices=list(QR_FORMATS), default='png')
+    parser.add_argument('--size', choices=list(QR_TIERS), default=QR_DEFAULT_TIER)
+    args = parser.parse_args()
+    regenerate_all_qrs(workers=args.workers, fmt=args.format, tier=args.size)
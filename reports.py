@@ -1,286 +1,413 @@
-import matplotlib
-matplotlib.use('Agg')
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 import matplotlib.ticker as mticker
 from datetime import datetime, date, timedelta
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 import io
 import base64
-from models import Employee, Attendance, db
+from collections import namedtuple
+from flask import g, has_app_context
+from models import Employee, Attendance, DailyAttendanceSummary, db
+from cache import LRUCache
+from counters import get_range_revision
+
+# Resolución de los gráficos que se muestran en la página del reporte
+CHART_DPI = 100
+# Reportes ya calculados (tablas y gráficos), por tipo, rango, empleado y página, junto
+# con la revisión de los datos del rango: un registro o una edición en una fecha del rango
+# cambia la clave, y los períodos pasados se sirven siempre desde la caché. El TTL acota
+# lo que tarda en verse un cambio hecho fuera de la aplicación (ej. un script).
+REPORT_CACHE_TTL = 600
+_report_cache = LRUCache(max_entries=128, ttl=REPORT_CACHE_TTL)
+
+def cached_report(report_type, start_date, end_date, factory, employee_id=None, page=None):
+    """Devuelve el reporte desde la caché o lo calcula con factory() si cambió la revisión del rango."""
+    key = (report_type, start_date, end_date, employee_id, page, get_range_revision(start_date, end_date))
+    return _report_cache.get_or_create(key, factory)
+
+def format_duration(total_seconds):
+    """
+    Convierte una cantidad de segundos en texto legible (horas, minutos, segundos).
+    """
+    total_seconds = int(total_seconds)
+    horas = total_seconds // 3600
+    minutos = (total_seconds % 3600) // 60
+    segundos = total_seconds % 60
+    horas_str = []
+    if horas > 0:
+        horas_str.append(f"{horas} hora{'s' if horas != 1 else ''}")
+    if minutos > 0:
+        horas_str.append(f"{minutos} minuto{'s' if minutos != 1 else ''}")
+    if segundos > 0:
+        horas_str.append(f"{segundos} segundo{'s' if segundos != 1 else ''}")
+    return ', '.join(horas_str)
+
+def pair_entries_exits(df):
+    """
+    Empareja cada entrada con la primera salida posterior no usada del mismo empleado.
+
+    Ordena una sola vez por (employee_id, timestamp) y resuelve el emparejamiento con
+    operaciones vectorizadas por grupo, en lugar de filtrar el DataFrame por empleado.
+    Devuelve una Serie con los segundos trabajados por empleado.
+    """
+    # A igual hora la salida va antes que la entrada: solo cuenta una salida estrictamente posterior
+    events = df[['employee_id', 'timestamp', 'attendance_type']].assign(
+        _orden=(df['attendance_type'] == 'entrada').astype('int8')
+    ).sort_values(['employee_id', 'timestamp', '_orden'], kind='mergesort')
+    is_salida = events['attendance_type'] == 'salida'
+    is_entrada = events['attendance_type'] == 'entrada'
+    events['_salidas_previas'] = is_salida.astype('int64').groupby(events['employee_id']).cumsum()
+
+    entradas = events[is_entrada]
+    salidas = events[is_salida]
+    if entradas.empty or salidas.empty:
+        return pd.Series(0, index=pd.Index(df['employee_id'].unique(), name='employee_id'), dtype='int64')
+
+    # Índice de la salida asignada a la k-ésima entrada: m_k = k + cummax(c_k - k),
+    # donde c_k es la cantidad de salidas con hora <= entrada_k (recorrido de dos punteros)
+    k = entradas.groupby('employee_id').cumcount()
+    holgura = (entradas['_salidas_previas'] - k).groupby(entradas['employee_id']).cummax()
+    salida_idx = (k + holgura).to_numpy()
+
+    salidas_por_empleado = salidas.groupby('employee_id').size()
+    inicio_salidas = salidas_por_empleado.cumsum() - salidas_por_empleado
+    total_salidas = salidas_por_empleado.reindex(entradas['employee_id']).fillna(0).to_numpy()
+    inicio = inicio_salidas.reindex(entradas['employee_id']).fillna(0).to_numpy()
+    emparejada = salida_idx < total_salidas
+
+    salida_ns = salidas['timestamp'].to_numpy(dtype='datetime64[ns]').astype('int64')
+    entrada_ns = entradas['timestamp'].to_numpy(dtype='datetime64[ns]').astype('int64')
+    posiciones = (inicio + salida_idx)[emparejada].astype('int64')
+    segundos = (salida_ns[posiciones] - entrada_ns[emparejada]) // 1_000_000_000
+
+    pares = pd.Series(segundos, index=entradas['employee_id'].to_numpy()[emparejada])
+    total = pares.groupby(level=0).sum()
+    return total.reindex(df['employee_id'].unique(), fill_value=0).rename_axis('employee_id')
 
 def summarize_hours_worked(df):
     if df.empty:
         return pd.DataFrame()
-    employee_summary = []
-    for employee_id in df['employee_id'].unique():
-        emp_data = df[df['employee_id'] == employee_id].sort_values('timestamp')
-        entradas = emp_data[emp_data['attendance_type'] == 'entrada']['timestamp'].tolist()
-        salidas = emp_data[emp_data['attendance_type'] == 'salida']['timestamp'].tolist()
-        total_seconds = 0
-        used_salidas = set()
-        for entrada_time in entradas:
-            salida_time = None
-            for idx, s in enumerate(salidas):
-                if s > entrada_time and idx not in used_salidas:
-                    salida_time = s
-                    used_salidas.add(idx)
-                    break
-            if entrada_time and salida_time:
-                total_seconds += int((salida_time - entrada_time).total_seconds())
-        # Solo mostrar horas si hay al menos una salida válida
-        if total_seconds > 0:
-            horas = total_seconds // 3600
-            minutos = (total_seconds % 3600) // 60
-            segundos = total_seconds % 60
-            horas_str = []
-            if horas > 0:
-                horas_str.append(f"{horas} hora{'s' if horas != 1 else ''}")
-            if minutos > 0:
-                horas_str.append(f"{minutos} minuto{'s' if minutos != 1 else ''}")
-            if segundos > 0:
-                horas_str.append(f"{segundos} segundo{'s' if segundos != 1 else ''}")
-            horas_legible = ', '.join(horas_str)
-        else:
-            horas_legible = 'N/A'
-        entrada_time = entradas[0] if entradas else None
-        # Salida solo si hay alguna salida válida
-        salida_time = None
-        for s in reversed(salidas):
-            if entradas and s > entradas[0]:
-                salida_time = s
-                break
-        address = emp_data[emp_data['attendance_type'] == 'entrada']['address'].iloc[0] if not emp_data[emp_data['attendance_type'] == 'entrada'].empty and 'address' in emp_data else ''
-        # Obtener el ID de la primera entrada para referencia
-        attendance_id = emp_data[emp_data['attendance_type'] == 'entrada']['attendance_id'].iloc[0] if not emp_data[emp_data['attendance_type'] == 'entrada'].empty and 'attendance_id' in emp_data else None
-        employee_summary.append({
-            'ID': employee_id,
-            'Nombre': emp_data['employee_name'].iloc[0],
-            'Departamento': emp_data['department'].iloc[0],
-            'Entrada': entrada_time.strftime('%H:%M:%S') if entrada_time else 'No registrada',
-            'Salida': salida_time.strftime('%H:%M:%S') if salida_time else 'No registrada',
-            'Horas Trabajadas': horas_legible,
-            'Dirección': address,
-            'attendance_id': attendance_id  # ID para edición
-        })
-    return pd.DataFrame(employee_summary)
+    total_seconds = pair_entries_exits(df)
+    ordered = df.sort_values(['employee_id', 'timestamp'], kind='mergesort')
+    por_empleado = ordered.groupby('employee_id', sort=False)
+    primera_fila = por_empleado[['employee_name', 'department']].first()
+    entradas = ordered[ordered['attendance_type'] == 'entrada']
+    salidas = ordered[ordered['attendance_type'] == 'salida']
+    primera_entrada = entradas.drop_duplicates('employee_id').set_index('employee_id')
+    ultima_salida = salidas.groupby('employee_id')['timestamp'].max()
+
+    employee_ids = df['employee_id'].unique()
+    entrada_time = primera_entrada['timestamp'].reindex(employee_ids)
+    salida_time = ultima_salida.reindex(employee_ids)
+    # Salida solo si hay alguna salida posterior a la primera entrada
+    salida_time = salida_time.where(salida_time > entrada_time)
+    if 'address' in primera_entrada:
+        address = primera_entrada['address'].reindex(employee_ids).where(entrada_time.notna(), '')
+    else:
+        address = pd.Series('', index=employee_ids)
+    if 'attendance_id' in primera_entrada:
+        attendance_id = primera_entrada['attendance_id'].reindex(employee_ids).astype('Int64')
+    else:
+        attendance_id = pd.Series(pd.NA, index=employee_ids, dtype='Int64')
+
+    # Solo mostrar horas si hay al menos una salida válida
+    horas_legible = [format_duration(s) if s > 0 else 'N/A' for s in total_seconds.reindex(employee_ids)]
+    return pd.DataFrame({
+        'ID': employee_ids,
+        'Nombre': primera_fila['employee_name'].reindex(employee_ids).to_numpy(),
+        'Departamento': primera_fila['department'].reindex(employee_ids).to_numpy(),
+        'Entrada': entrada_time.dt.strftime('%H:%M:%S').fillna('No registrada').to_numpy(),
+        'Salida': salida_time.dt.strftime('%H:%M:%S').fillna('No registrada').to_numpy(),
+        'Horas Trabajadas': horas_legible,
+        'Dirección': address.to_numpy(),
+        'attendance_id': attendance_id.array  # ID para edición
+    })
+
+ATTENDANCE_COLUMNS = [
+    'attendance_id', 'employee_id', 'name', 'last_name', 'department', 'date',
+    'timestamp', 'attendance_type', 'address', 'latitude', 'longitude'
+]
+
+def attendance_select(start_date=None, end_date=None, employee_id=None):
+    """
+    Construye un único SELECT con JOIN a Employee y solo las columnas que usan los reportes.
+    """
+    query = db.select(
+        Attendance.id.label('attendance_id'),
+        Attendance.employee_id,
+        Employee.name,
+        Employee.last_name,
+        Employee.department,
+        Attendance.date,
+        Attendance.timestamp,
+        Attendance.attendance_type,
+        Attendance.address,
+        Attendance.latitude,
+        Attendance.longitude,
+    ).join(Employee, Employee.employee_id == Attendance.employee_id)
+
+    if start_date:
+        query = query.where(Attendance.date >= start_date)
+    if end_date:
+        query = query.where(Attendance.date <= end_date)
+    if employee_id:
+        query = query.where(Attendance.employee_id == employee_id)
+    return query
+
+def attendance_frame(rows):
+    """
+    Arma el DataFrame de asistencias a partir de filas (tuplas) en el orden de ATTENDANCE_COLUMNS.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(ATTENDANCE_COLUMNS)
+    df = pd.DataFrame({name: list(values) for name, values in zip(ATTENDANCE_COLUMNS, columns)})
+    df.insert(2, 'employee_name', df['name'] + ' ' + df['last_name'])
+    return df.drop(columns=['name', 'last_name'])
+
+def load_attendance_data(start_date=None, end_date=None, employee_id=None):
+    """
+    Igual que get_attendance_data, pero memoizado durante la solicitud actual (flask.g):
+    los gráficos y el resumen de un mismo reporte comparten una sola consulta.
+    """
+    if not has_app_context():
+        return get_attendance_data(start_date, end_date, employee_id)
+    frames = g.setdefault('_attendance_frames', {})
+    key = (start_date, end_date, employee_id)
+    if key not in frames:
+        frames[key] = get_attendance_data(start_date, end_date, employee_id)
+    return frames[key]
+
+def iter_attendance_batches(start_date=None, end_date=None, employee_id=None, batch_size=1000):
+    """
+    Recorre las asistencias filtradas en orden de id usando paginación por clave
+    (WHERE id > último id visto), un lote de filas a la vez.
+    """
+    last_id = 0
+    while True:
+        query = attendance_select(start_date, end_date, employee_id).where(
+            Attendance.id > last_id).order_by(Attendance.id).limit(batch_size)
+        rows = db.session.execute(query).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
 
 def get_attendance_data(start_date=None, end_date=None, employee_id=None):
     """
     Obtiene datos de asistencia filtrados por fecha y empleado.
+    Usa una sola consulta con JOIN, sin cargar objetos Employee por cada registro.
     """
-    query = Attendance.query
-    
+    rows = db.session.execute(attendance_select(start_date, end_date, employee_id)).all()
+    if not rows:
+        return pd.DataFrame()
+    return attendance_frame(rows)
+
+SUMMARY_COLUMNS = [
+    'attendance_id', 'employee_id', 'name', 'last_name', 'department', 'date',
+    'entrada_time', 'salida_time', 'address', 'latitude', 'longitude',
+]
+
+def daily_summary_select(start_date=None, end_date=None, employee_id=None):
+    """
+    Consulta de DailyAttendanceSummary con los datos del empleado (columnas de
+    SUMMARY_COLUMNS), ordenada por fecha y empleado.
+    """
+    query = db.select(
+        DailyAttendanceSummary.entrada_id,
+        DailyAttendanceSummary.employee_id,
+        Employee.name,
+        Employee.last_name,
+        Employee.department,
+        DailyAttendanceSummary.date,
+        DailyAttendanceSummary.entrada_time,
+        DailyAttendanceSummary.salida_time,
+        DailyAttendanceSummary.address,
+        DailyAttendanceSummary.latitude,
+        DailyAttendanceSummary.longitude,
+    ).join(Employee, Employee.employee_id == DailyAttendanceSummary.employee_id)
     if start_date:
-        query = query.filter(Attendance.date >= start_date)
+        query = query.where(DailyAttendanceSummary.date >= start_date)
     if end_date:
-        query = query.filter(Attendance.date <= end_date)
+        query = query.where(DailyAttendanceSummary.date <= end_date)
     if employee_id:
-        query = query.filter(Attendance.employee_id == employee_id)
-    
-    attendances = query.all()
-    
-    data = []
-    for attendance in attendances:
-        data.append({
-            'attendance_id': attendance.id,  # Incluir ID de asistencia
-            'employee_id': attendance.employee_id,
-            'employee_name': attendance.employee.full_name,
-            'department': attendance.employee.department,
-            'date': attendance.date,
-            'timestamp': attendance.timestamp,
-            'attendance_type': attendance.attendance_type,
-            'address': getattr(attendance, 'address', '')
-        })
-    
-    return pd.DataFrame(data)
+        query = query.where(DailyAttendanceSummary.employee_id == employee_id)
+    return query.order_by(DailyAttendanceSummary.date, DailyAttendanceSummary.employee_id)
 
-def generate_individual_report(start_date, end_date, employee_id):
+def summary_rows_to_report(rows):
     """
-    Genera un reporte individual mostrando cada día por separado.
+    Convierte filas de daily_summary_select en el reporte por empleado y día
+    (Fecha, Entrada, Salida, Horas Trabajadas, Dirección).
     """
-    df = get_attendance_data(start_date=start_date, end_date=end_date, employee_id=employee_id)
-    
-    if df.empty:
-        return None, f"No hay datos de asistencia para el empleado {employee_id} en el período seleccionado."
-    
-    # Agrupar por fecha para mostrar cada día
-    employee_summary = []
-    
-    # Obtener todas las fechas únicas en el período
-    for target_date in df['date'].unique():
-        day_data = df[df['date'] == target_date]
-        
-        entrada = day_data[day_data['attendance_type'] == 'entrada']
-        salida = day_data[day_data['attendance_type'] == 'salida']
-        
-        fecha_str = target_date.strftime('%d/%m/%Y')
-        entrada_time = entrada['timestamp'].iloc[0] if not entrada.empty else None
-        salida_time = salida['timestamp'].iloc[-1] if not salida.empty else None
-        
-        # Calcular horas trabajadas
-        hours_worked = 0
+    records = []
+    for row in rows:
+        entrada_time, salida_time = row.entrada_time, row.salida_time
         if entrada_time and salida_time:
-            hours_worked = (salida_time - entrada_time).total_seconds()
-            horas = int(hours_worked // 3600)
-            minutos = int((hours_worked % 3600) // 60)
-            segundos = int(hours_worked % 60)
-            
-            horas_str = []
-            if horas > 0:
-                horas_str.append(f"{horas} hora{'s' if horas != 1 else ''}")
-            if minutos > 0:
-                horas_str.append(f"{minutos} minuto{'s' if minutos != 1 else ''}")
-            if segundos > 0:
-                horas_str.append(f"{segundos} segundo{'s' if segundos != 1 else ''}")
-            horas_legible = ', '.join(horas_str) if horas_str else '0 segundos'
+            horas_legible = format_duration(max((salida_time - entrada_time).total_seconds(), 0)) or '0 segundos'
         else:
             horas_legible = 'N/A'
-        
-        # Obtener información adicional
-        address = entrada['address'].iloc[0] if not entrada.empty and 'address' in entrada else ''
-        attendance_id = entrada['attendance_id'].iloc[0] if not entrada.empty and 'attendance_id' in entrada else None
-        
-        employee_summary.append({
-            'attendance_id': attendance_id,
-            'Fecha': fecha_str,
-            'ID': employee_id,
-            'Nombre': day_data['employee_name'].iloc[0],
-            'Departamento': day_data['department'].iloc[0],
+        records.append({
+            'attendance_id': row.entrada_id,
+            'Fecha': row.date.strftime('%d/%m/%Y'),
+            'ID': row.employee_id,
+            'Nombre': f"{row.name} {row.last_name}",
+            'Departamento': row.department,
             'Entrada': entrada_time.strftime('%H:%M:%S') if entrada_time else 'No registrada',
             'Salida': salida_time.strftime('%H:%M:%S') if salida_time else 'No registrada',
             'Horas Trabajadas': horas_legible,
-            'Dirección': address
+            'Dirección': row.address if entrada_time else '',
         })
-    
-    # Ordenar por fecha
-    employee_summary = sorted(employee_summary, key=lambda x: x['Fecha'])
-    
-    return pd.DataFrame(employee_summary), None
+    report = pd.DataFrame(records)
+    report['attendance_id'] = pd.array(report['attendance_id'], dtype='Int64')
+    return report
+
+# Filas por página en las tablas de reportes
+REPORT_PAGE_SIZE = 100
+# Columnas que un administrador puede editar en la tabla
+EDITABLE_COLUMNS = ('Entrada', 'Salida')
+
+class ReportPage(namedtuple('ReportPage', ['columns', 'rows', 'editable', 'page', 'page_size', 'total'])):
+    """
+    Una página de un reporte para la plantilla: columnas visibles, filas como tuplas
+    (attendance_id, valores...) e índices de las columnas editables.
+    """
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.page_size))
+
+def clamp_page(page, total, page_size=REPORT_PAGE_SIZE):
+    """Página válida entre 1 y la última."""
+    last_page = max(1, -(-total // page_size))
+    return min(max(page or 1, 1), last_page)
+
+def frame_to_page(df, page, total, page_size=REPORT_PAGE_SIZE):
+    """Convierte las filas de un reporte (DataFrame con attendance_id) en un ReportPage."""
+    columns = [column for column in df.columns if column != 'attendance_id']
+    ids = [None if pd.isna(value) else int(value) for value in df['attendance_id']]
+    rows = list(zip(ids, *(df[column].tolist() for column in columns)))
+    editable = frozenset(i for i, column in enumerate(columns) if column in EDITABLE_COLUMNS)
+    return ReportPage(columns, rows, editable, page, page_size, total)
+
+def paginate_report(df, page, page_size=REPORT_PAGE_SIZE):
+    """Página de un reporte ya calculado en memoria (ej. el diario)."""
+    page = clamp_page(page, len(df), page_size)
+    start = (page - 1) * page_size
+    return frame_to_page(df.iloc[start:start + page_size], page, len(df), page_size)
+
+def summary_report_page(start_date, end_date, employee_id=None, page=1, page_size=REPORT_PAGE_SIZE):
+    """
+    Página del reporte individual o general desde el resumen diario: cuenta las filas
+    y lee solo las de la página (LIMIT/OFFSET), en el mismo orden que el reporte completo.
+    Devuelve None si el período no tiene datos.
+    """
+    query = daily_summary_select(start_date, end_date, employee_id)
+    total = db.session.execute(db.select(db.func.count()).select_from(query.order_by(None).subquery())).scalar()
+    if not total:
+        return None
+    page = clamp_page(page, total, page_size)
+    rows = db.session.execute(query.limit(page_size).offset((page - 1) * page_size)).all()
+    return frame_to_page(summary_rows_to_report(rows), page, total, page_size)
+
+def generate_individual_report(start_date, end_date, employee_id):
+    """
+    Genera un reporte individual mostrando cada día por separado.
+    Lee una fila por día del resumen diario, sin agrupar los registros crudos.
+    """
+    rows = db.session.execute(daily_summary_select(start_date, end_date, employee_id)).all()
+    if not rows:
+        return None, f"No hay datos de asistencia para el empleado {employee_id} en el período seleccionado."
+    return summary_rows_to_report(rows), None
 
 def generate_general_detailed_report(start_date, end_date):
     """
     Genera un reporte general detallado mostrando todas las asistencias día por día de todos los empleados.
+    Lee una fila por empleado y día del resumen diario.
     """
-    df = get_attendance_data(start_date=start_date, end_date=end_date)
-    
-    if df.empty:
+    rows = db.session.execute(daily_summary_select(start_date, end_date)).all()
+    if not rows:
         return None, f"No hay datos de asistencia en el período seleccionado."
-    
-    # Agrupar por empleado y fecha para mostrar cada día
-    all_attendances = []
-    
-    # Obtener todas las combinaciones únicas de empleado y fecha
-    for (employee_id, target_date), group in df.groupby(['employee_id', 'date']):
-        entrada = group[group['attendance_type'] == 'entrada']
-        salida = group[group['attendance_type'] == 'salida']
-        
-        fecha_str = target_date.strftime('%d/%m/%Y')
-        entrada_time = entrada['timestamp'].iloc[0] if not entrada.empty else None
-        salida_time = salida['timestamp'].iloc[-1] if not salida.empty else None
-        
-        # Calcular horas trabajadas
-        if entrada_time and salida_time:
-            hours_worked = (salida_time - entrada_time).total_seconds()
-            horas = int(hours_worked // 3600)
-            minutos = int((hours_worked % 3600) // 60)
-            segundos = int(hours_worked % 60)
-            
-            horas_str = []
-            if horas > 0:
-                horas_str.append(f"{horas} hora{'s' if horas != 1 else ''}")
-            if minutos > 0:
-                horas_str.append(f"{minutos} minuto{'s' if minutos != 1 else ''}")
-            if segundos > 0:
-                horas_str.append(f"{segundos} segundo{'s' if segundos != 1 else ''}")
-            horas_legible = ', '.join(horas_str) if horas_str else '0 segundos'
+    return summary_rows_to_report(rows), None
+
+# Días de asistencia que se procesan por bloque en las exportaciones
+REPORT_CHUNK_DAYS = 7
+
+def iter_report_chunks(start_date, end_date, employee_id=None, days_per_chunk=REPORT_CHUNK_DAYS, progress=None):
+    """
+    Genera el reporte individual (si se indica employee_id) o general detallado por
+    bloques de días consecutivos, para no tener todo el período en memoria a la vez.
+    progress(fracción), si se indica, se llama después de leer cada bloque.
+    """
+    total_days = (end_date - start_date).days + 1
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=days_per_chunk - 1), end_date)
+        if employee_id:
+            summary, _ = generate_individual_report(chunk_start, chunk_end, employee_id)
         else:
-            horas_legible = 'N/A'
-        
-        # Obtener información adicional
-        address = entrada['address'].iloc[0] if not entrada.empty and 'address' in entrada else ''
-        attendance_id = entrada['attendance_id'].iloc[0] if not entrada.empty and 'attendance_id' in entrada else None
-        
-        all_attendances.append({
-            'attendance_id': attendance_id,
-            'Fecha': fecha_str,
-            'ID': employee_id,
-            'Nombre': group['employee_name'].iloc[0],
-            'Departamento': group['department'].iloc[0],
-            'Entrada': entrada_time.strftime('%H:%M:%S') if entrada_time else 'No registrada',
-            'Salida': salida_time.strftime('%H:%M:%S') if salida_time else 'No registrada',
-            'Horas Trabajadas': horas_legible,
-            'Dirección': address
-        })
-    
-    # Ordenar por fecha y luego por empleado
-    all_attendances = sorted(all_attendances, key=lambda x: (x['Fecha'], x['ID']))
-    
-    return pd.DataFrame(all_attendances), None
+            summary, _ = generate_general_detailed_report(chunk_start, chunk_end)
+        if progress:
+            progress(((chunk_end - start_date).days + 1) / total_days)
+        if summary is not None and not summary.empty:
+            yield summary
+        chunk_start = chunk_end + timedelta(days=1)
 
 def generate_daily_report(target_date=None):
     """
-    Genera un reporte diario de asistencia.
+    Genera un reporte diario de asistencia a partir del resumen diario.
     """
     if not target_date:
         target_date = date.today()
     
-    df = get_attendance_data(start_date=target_date, end_date=target_date)
-    print(f"[DEBUG] Asistencias encontradas para {target_date}: {len(df)} registros")
-    print(df)
+    query = daily_summary_select(start_date=target_date, end_date=target_date).order_by(None).order_by(
+        DailyAttendanceSummary.id)
+    rows = db.session.execute(query).all()
     
-    if df.empty:
+    if not rows:
         return None, "No hay datos de asistencia para la fecha seleccionada."
     
-    # Agrupar por empleado
     employee_summary = []
-    for employee_id in df['employee_id'].unique():
-        emp_data = df[df['employee_id'] == employee_id]
-        
-        entrada = emp_data[emp_data['attendance_type'] == 'entrada']
-        salida = emp_data[emp_data['attendance_type'] == 'salida']
-        
-        entrada_time = entrada['timestamp'].iloc[0] if not entrada.empty else None
-        salida_time = salida['timestamp'].iloc[-1] if not salida.empty else None
+    for row in rows:
+        entrada_time, salida_time = row.entrada_time, row.salida_time
         
         # Calcular horas trabajadas
         hours_worked = 0
         if entrada_time and salida_time:
             hours_worked = (salida_time - entrada_time).total_seconds() / 3600
         
-        # Obtener latitud, longitud y dirección de la primera entrada (si existe)
-        lat = entrada['latitude'].iloc[0] if not entrada.empty and 'latitude' in entrada else None
-        lon = entrada['longitude'].iloc[0] if not entrada.empty and 'longitude' in entrada else None
-        address = entrada['address'].iloc[0] if not entrada.empty and 'address' in entrada else ''
-        # Obtener el ID de la primera entrada para referencia
-        attendance_id = entrada['attendance_id'].iloc[0] if not entrada.empty and 'attendance_id' in entrada else None
-        lat_str = f"{lat:.6f}" if lat is not None else "-"
-        lon_str = f"{lon:.6f}" if lon is not None else "-"
+        # Latitud, longitud y dirección son las de la primera entrada (si existe)
+        lat_str = f"{row.latitude:.6f}" if row.latitude is not None else "-"
+        lon_str = f"{row.longitude:.6f}" if row.longitude is not None else "-"
         employee_summary.append({
-            'attendance_id': attendance_id,  # ID para edición
-            'ID': employee_id,
-            'Nombre': emp_data['employee_name'].iloc[0],
-            'Departamento': emp_data['department'].iloc[0],
+            'attendance_id': row.entrada_id,  # ID para edición
+            'ID': row.employee_id,
+            'Nombre': f"{row.name} {row.last_name}",
+            'Departamento': row.department,
             'Entrada': entrada_time.strftime('%H:%M:%S') if entrada_time else 'No registrada',
             'Salida': salida_time.strftime('%H:%M:%S') if salida_time else 'No registrada',
             'Horas Trabajadas': f"{hours_worked:.2f}" if hours_worked > 0 else 'N/A',
             'Latitud': lat_str,
             'Longitud': lon_str,
-            'Dirección': address
+            'Dirección': row.address if entrada_time else ''
         })
     
-    return pd.DataFrame(employee_summary), None
+    report = pd.DataFrame(employee_summary)
+    report['attendance_id'] = pd.array(report['attendance_id'], dtype='Int64')
+    return report, None
 
-def generate_attendance_chart(start_date, end_date):
+def _figure_png(fig):
+    """Guarda la figura como PNG en memoria."""
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format='png', dpi=CHART_DPI, bbox_inches='tight')
+    img_buffer.seek(0)
+    return img_buffer
+
+def generate_attendance_chart(start_date, end_date, df=None):
     """
     Genera un gráfico de asistencia por día.
+    Usa la API de objetos de matplotlib (Figure), sin el estado global de pyplot,
+    para poder renderizar desde varios hilos a la vez.
+    Si se pasa df (datos ya cargados del período) no se vuelve a consultar la base.
     """
-    df = get_attendance_data(start_date=start_date, end_date=end_date)
+    if df is None:
+        df = load_attendance_data(start_date=start_date, end_date=end_date)
     
     if df.empty:
         return None
@@ -288,33 +415,29 @@ def generate_attendance_chart(start_date, end_date):
     # Contar asistencias por día
     daily_counts = df.groupby('date').size().reset_index(name='count')
     
-    plt.figure(figsize=(12, 6))
-    plt.plot(daily_counts['date'], daily_counts['count'], marker='o', linewidth=2, markersize=8)
-    plt.title('Registros de Asistencia por Día', fontsize=16, fontweight='bold')
-    plt.xlabel('Fecha', fontsize=12)
-    plt.ylabel('Número de Registros', fontsize=12)
-    plt.grid(True, alpha=0.3)
-    plt.xticks(rotation=45)
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(daily_counts['date'], daily_counts['count'], marker='o', linewidth=2, markersize=8)
+    ax.set_title('Registros de Asistencia por Día', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Fecha', fontsize=12)
+    ax.set_ylabel('Número de Registros', fontsize=12)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
 
     # Formatear fechas en el eje X
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
-    plt.gca().xaxis.set_major_locator(mticker.MaxNLocator(nbins=15))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
+    ax.xaxis.set_major_locator(mticker.MaxNLocator(nbins=15))
 
-    plt.tight_layout()
-    
-    # Guardar en memoria
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=300, bbox_inches='tight')
-    img_buffer.seek(0)
-    plt.close()
-    
-    return img_buffer
+    fig.tight_layout()
+    return _figure_png(fig)
 
-def generate_department_chart(start_date, end_date):
+def generate_department_chart(start_date, end_date, df=None):
     """
     Genera un gráfico de asistencia por departamento.
+    Si se pasa df (datos ya cargados del período) no se vuelve a consultar la base.
     """
-    df = get_attendance_data(start_date=start_date, end_date=end_date)
+    if df is None:
+        df = load_attendance_data(start_date=start_date, end_date=end_date)
     
     if df.empty:
         return None
@@ -323,54 +446,73 @@ def generate_department_chart(start_date, end_date):
     dept_counts = df.groupby('department')['employee_id'].nunique().reset_index()
     dept_counts.columns = ['Departamento', 'Empleados']
     
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(dept_counts['Departamento'], dept_counts['Empleados'], 
-                   color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7'])
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    bars = ax.bar(dept_counts['Departamento'], dept_counts['Empleados'], 
+                  color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7'])
     
-    plt.title('Empleados Activos por Departamento', fontsize=16, fontweight='bold')
-    plt.xlabel('Departamento', fontsize=12)
-    plt.ylabel('Número de Empleados', fontsize=12)
-    plt.xticks(rotation=45)
+    ax.set_title('Empleados Activos por Departamento', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Departamento', fontsize=12)
+    ax.set_ylabel('Número de Empleados', fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45)
     
     # Añadir valores en las barras
     for bar in bars:
         height = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2., height,
+        ax.text(bar.get_x() + bar.get_width()/2., height,
                 f'{int(height)}', ha='center', va='bottom', fontweight='bold')
     
-    plt.tight_layout()
-    
-    # Guardar en memoria
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=300, bbox_inches='tight')
-    img_buffer.seek(0)
-    plt.close()
-    
-    return img_buffer
+    fig.tight_layout()
+    return _figure_png(fig)
+
+CHART_GENERATORS = {
+    'asistencia': generate_attendance_chart,
+    'departamento': generate_department_chart,
+}
+
+def get_period_charts(start_date, end_date):
+    """
+    PNG de los gráficos del reporte de período, {tipo: bytes o None si no hay datos},
+    desde la caché de reportes. Al recalcular, los dos gráficos usan una sola consulta.
+    """
+    def render():
+        df = load_attendance_data(start_date=start_date, end_date=end_date)
+        charts = {}
+        for chart_type, generator in CHART_GENERATORS.items():
+            img_buffer = generator(start_date, end_date, df=df)
+            charts[chart_type] = img_buffer.getvalue() if img_buffer is not None else None
+        return charts
+
+    return cached_report('periodo', start_date, end_date, render)
+
+def get_daily_summary(report_date):
+    """Horas trabajadas por empleado en un día (reporte diario), desde la caché de reportes."""
+    return cached_report('diario', report_date, report_date, lambda: summarize_hours_worked(
+        get_attendance_data(start_date=report_date, end_date=report_date)))
+
+def get_summary_report_page(start_date, end_date, employee_id=None, page=1):
+    """summary_report_page (reporte individual o general) desde la caché de reportes."""
+    report_type = 'individual' if employee_id else 'general'
+    return cached_report(report_type, start_date, end_date,
+                         lambda: summary_report_page(start_date, end_date, employee_id, page),
+                         employee_id=employee_id, page=page)
 
 def generate_pdf_report(start_date, end_date, filename):
     """
-    Genera un reporte PDF completo.
+    Genera un reporte PDF completo con el resumen de horas por empleado del período.
+    filename puede ser una ruta o un archivo abierto en modo binario.
+    Devuelve el resumen usado para el PDF y un mensaje de error (o None).
     """
-    doc = SimpleDocTemplate(filename, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Centrado
-    )
-    
-    title = Paragraph(f"Reporte de Asistencia<br/>{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}", title_style)
-    story.append(title)
-    story.append(Spacer(1, 20))
-    
-    # Resumen estadístico
-    df = get_attendance_data(start_date=start_date, end_date=end_date)
-    
+    from exports import build_pdf
+
+    df = load_attendance_data(start_date=start_date, end_date=end_date)
     summary = summarize_hours_worked(df)
-    return summary, None
\ No newline at end of file
+    columns = [col for col in summary.columns if col != 'attendance_id']
+    batches = [list(summary[columns].itertuples(index=False, name=None))] if not summary.empty else []
+    build_pdf(filename, "Reporte de Asistencia",
+              f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}",
+              columns or ['ID', 'Nombre', 'Departamento', 'Entrada', 'Salida', 'Horas Trabajadas', 'Dirección'],
+              batches)
+    if summary.empty:
+        return summary, "No hay datos de asistencia en el período seleccionado."
+    return summary, None
@@ -0,0 +1,35 @@
+"""
+Lista de empleados activos en caché para los desplegables de reportes y el listado.
+
+Guarda tuplas livianas en lugar de objetos Employee. La clave de la caché es el
+contador de ediciones de empleados, que add_employee, edit_employee y
+delete_employee incrementan en su misma transacción: al confirmarse cualquiera de
+ellas la siguiente lectura ve otra clave y recarga la lista (también en otros procesos).
+"""
+from collections import namedtuple
+
+from models import db, Employee
+from cache import LRUCache
+from counters import get_counter, EMPLOYEE_EDITS
+
+RosterEntry = namedtuple('RosterEntry', ['employee_id', 'full_name', 'department', 'position'])
+
+# Pocas versiones: solo la vigente se vuelve a leer
+_roster_cache = LRUCache(max_entries=2)
+
+
+def load_active_roster():
+    """Consulta los empleados activos como tuplas RosterEntry, sin cargar objetos del ORM."""
+    rows = db.session.execute(
+        db.select(Employee.employee_id, Employee.name, Employee.last_name, Employee.department,
+                  Employee.position)
+        .where(Employee.is_active == True).order_by(Employee.id)
+    ).all()
+    return tuple(RosterEntry(employee_id, f"{name} {last_name}", department, position)
+                 for employee_id, name, last_name, department, position in rows)
+
+
+def get_active_roster():
+    """Empleados activos desde la caché; se recarga cuando cambió el contador de ediciones."""
+    return _roster_cache.get_or_create(get_counter(EMPLOYEE_EDITS), load_active_roster)
+
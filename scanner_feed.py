@@ -0,0 +1,63 @@
+"""
+Registros del día para la página del escáner, como feed JSON con cursor.
+
+El cursor es el id del último registro que el kiosco ya tiene: cada consulta pide
+solo los registros con id mayor, con el nombre y departamento del empleado ya unidos,
+así actualizar la lista cuesta lo que llegó desde la consulta anterior y no todo el día.
+La primera carga trae solo los registros más recientes.
+"""
+from models import db, Employee, Attendance
+
+# Registros de la primera carga y máximo por consulta
+FEED_INITIAL_ROWS = 50
+FEED_MAX_ROWS = 200
+
+
+def feed_item(attendance_id, employee_id, full_name, department, attendance_type, is_late, timestamp):
+    """Un registro como lo recibe la página (también es el contenido del evento 'asistencia')."""
+    return {
+        'id': attendance_id,
+        'employee_id': employee_id,
+        'full_name': full_name,
+        'department': department,
+        'attendance_type': attendance_type,
+        'is_late': bool(is_late),
+        'time': timestamp.strftime('%H:%M:%S'),
+    }
+
+
+def feed_select(day, after_id=None, limit=FEED_MAX_ROWS):
+    """
+    Registros del día con id mayor a after_id, en orden de id. Sin cursor devuelve los
+    `limit` más recientes (la consulta los trae en orden descendente).
+    """
+    query = db.select(
+        Attendance.id, Attendance.employee_id, Employee.name, Employee.last_name, Employee.department,
+        Attendance.attendance_type, Attendance.is_late, Attendance.timestamp,
+    ).join(Employee, Employee.employee_id == Attendance.employee_id).where(Attendance.date == day)
+    if after_id is None:
+        return query.order_by(Attendance.id.desc()).limit(limit)
+    return query.where(Attendance.id > after_id).order_by(Attendance.id).limit(limit)
+
+
+def get_feed(day, after_id=None, limit=None):
+    """
+    Devuelve {'date', 'items', 'cursor', 'has_more'} con los registros en orden de id.
+    `cursor` es el valor para la siguiente consulta y `has_more` indica que quedan
+    registros nuevos por pedir de inmediato.
+    """
+    if limit is None:
+        limit = FEED_INITIAL_ROWS if after_id is None else FEED_MAX_ROWS
+    limit = max(1, min(limit, FEED_MAX_ROWS))
+    rows = db.session.execute(feed_select(day, after_id, limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after_id is None:
+        # Primera carga: lo anterior a estos registros no se pide, no queda nada pendiente
+        rows.reverse()
+        has_more = False
+
+    items = [feed_item(row.id, row.employee_id, f"{row.name} {row.last_name}", row.department,
+                       row.attendance_type, row.is_late, row.timestamp) for row in rows]
+    cursor = items[-1]['id'] if items else (after_id or 0)
+    return {'date': day.isoformat(), 'items': items, 'cursor': cursor, 'has_more': has_more}
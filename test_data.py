@@ -1,6 +1,7 @@
 from app import app
 from models import db, Employee, Attendance
 from qr_generator import generate_qr_code
+from counters import rebuild_counters
 from datetime import datetime, date, timedelta
 import random
 
@@ -121,6 +122,8 @@ def create_test_data():
                         )
                         db.session.add(salida)
         
+        # Los registros se crearon sin pasar por los contadores del dashboard
+        rebuild_counters()
         db.session.commit()
         print("Registros de asistencia de prueba creados exitosamente.")
 
@@ -0,0 +1,90 @@
+"""
+Pruebas de los eventos en vivo (events.py): dos apps sobre el mismo SQLite temporal
+hacen de dos workers, cada una con su EventBroker.
+
+Ejecutar desde la raíz del proyecto:  python -m pytest -q
+"""
+import pytest
+from flask import Flask
+
+from events import EventBroker, queue_event
+from extensions import db, enable_sqlite_pragmas
+from models import DashboardCounter, LiveEvent
+
+# Segundos máximos que una prueba espera un evento
+WAIT = 5
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['EVENT_POLL_SECONDS'] = 0.05
+    db.init_app(app)
+    enable_sqlite_pragmas(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def workers(tmp_path):
+    apps = [make_app(tmp_path / 'test.db'), make_app(tmp_path / 'test.db')]
+    return apps, [EventBroker(app) for app in apps]
+
+
+def test_committed_event_reaches_every_worker(workers):
+    (app, _), brokers = workers
+    after = [broker.subscribe() for broker in brokers]
+    with app.app_context():
+        queue_event(db.session, 'asistencia', {'id': 1})
+        db.session.commit()
+
+    for broker, after_id in zip(brokers, after):
+        events, resync = broker.wait(after_id, WAIT)
+        assert not resync
+        assert [(e.type, e.data) for e in events] == [('asistencia', {'id': 1})]
+
+
+def test_rolled_back_event_is_not_published(workers):
+    (app, _), brokers = workers
+    after_id = brokers[1].subscribe()
+    with app.app_context():
+        queue_event(db.session, 'asistencia', {'id': 1})
+        db.session.rollback()
+        with db.session.begin_nested():
+            queue_event(db.session, 'asistencia', {'id': 2})
+            db.session.add(DashboardCounter(name='a', value=1))
+        try:
+            with db.session.begin_nested():
+                queue_event(db.session, 'asistencia', {'id': 3})
+                raise ValueError
+        except ValueError:
+            pass
+        db.session.commit()
+
+    events, _ = brokers[1].wait(after_id, WAIT)
+    assert [e.data['id'] for e in events] == [2]
+
+
+def test_reconnect_after_the_buffer_asks_for_resync(tmp_path):
+    app = make_app(tmp_path / 'test.db')
+    with app.app_context():
+        db.session.add_all(LiveEvent(type='asistencia', data='{}') for _ in range(5))
+        db.session.commit()
+    broker = EventBroker(app, history=3)
+    last_id = broker.subscribe()
+
+    assert last_id == 5
+    assert broker.wait(1, WAIT) == ([], True)
+    events, resync = broker.wait(3, WAIT)
+    assert not resync and [e.id for e in events] == [4, 5]
+
+
+def test_subscribers_over_the_limit_are_rejected(tmp_path):
+    broker = EventBroker(make_app(tmp_path / 'test.db'))
+    assert broker.subscribe(limit=2) is not None
+    assert broker.subscribe(limit=2) is not None
+    assert broker.subscribe(limit=2) is None
+    broker.unsubscribe()
+    assert broker.subscribe(limit=2) is not None
+    assert broker.subscribers == 2
@@ -0,0 +1,193 @@
+"""
+Pruebas del escritor con commit agrupado (group_commit.py) sobre un SQLite temporal.
+
+Ejecutar desde la raíz del proyecto:  python -m pytest -q
+"""
+import threading
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db, enable_sqlite_pragmas
+from group_commit import GroupCommitWriter, WriterBusyError
+from models import DashboardCounter
+
+# Segundos máximos que una prueba espera al hilo escritor
+WAIT = 5
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['GROUP_COMMIT_TIMEOUT'] = 0.2
+    db.init_app(app)
+    enable_sqlite_pragmas(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def writer(app):
+    return GroupCommitWriter(app)
+
+
+def add_counter(name):
+    db.session.add(DashboardCounter(name=name, value=1))
+    db.session.flush()
+    return name
+
+
+def fail(name):
+    add_counter(name)
+    raise ValueError(name)
+
+
+def saved_names(app):
+    with app.app_context():
+        return set(db.session.execute(db.select(DashboardCounter.name)).scalars())
+
+
+def saved_values(app):
+    with app.app_context():
+        return list(db.session.execute(db.select(DashboardCounter.value)).scalars())
+
+
+def hold_writer(writer):
+    """Ocupa el escritor con una función que espera el evento devuelto; lo que se encole después va en el grupo siguiente."""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(WAIT)
+        return add_counter('bloqueo')
+
+    future = writer.submit(blocker)
+    assert started.wait(WAIT)
+    return future, release
+
+
+def test_failing_job_only_rolls_back_its_savepoint(app, writer):
+    held, release = hold_writer(writer)
+    futures = [writer.submit(add_counter, 'a'), writer.submit(fail, 'b'), writer.submit(add_counter, 'c')]
+    release.set()
+
+    assert held.result(WAIT) == 'bloqueo'
+    assert futures[0].result(WAIT) == 'a'
+    with pytest.raises(ValueError):
+        futures[1].result(WAIT)
+    assert futures[2].result(WAIT) == 'c'
+    assert saved_names(app) == {'bloqueo', 'a', 'c'}
+
+
+def test_commit_failure_fails_every_job_in_the_group(app, writer):
+    held, release = hold_writer(writer)
+    futures = [writer.submit(add_counter, 'a'), writer.submit(add_counter, 'b')]
+
+    def broken_commit(session):
+        # Falla solo el commit del grupo, no la liberación de cada savepoint
+        if not session.in_nested_transaction():
+            raise RuntimeError('disco lleno')
+
+    event.listen(Session, 'before_commit', broken_commit)
+    try:
+        release.set()
+        for future in [held] + futures:
+            with pytest.raises(RuntimeError):
+                future.result(WAIT)
+    finally:
+        event.remove(Session, 'before_commit', broken_commit)
+
+    assert saved_names(app) == set()
+    # El escritor sigue atendiendo después del error
+    assert writer.execute(add_counter, 'd') == 'd'
+
+
+def test_execute_cancels_a_job_that_did_not_start(app, writer):
+    held, release = hold_writer(writer)
+    with pytest.raises(WriterBusyError):
+        writer.execute(add_counter, 'cancelado')
+    release.set()
+    held.result(WAIT)
+
+    assert writer.execute(add_counter, 'despues') == 'despues'
+    assert saved_names(app) == {'bloqueo', 'despues'}
+
+
+def test_execute_waits_a_bounded_time_for_a_running_job(app, writer):
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(WAIT)
+        return add_counter('lento')
+
+    begin = time.monotonic()
+    try:
+        with pytest.raises(WriterBusyError):
+            writer.execute(slow)
+        # Una espera para que empiece y otra para que termine, no indefinida
+        assert started.is_set()
+        assert time.monotonic() - begin < WAIT
+    finally:
+        release.set()
+
+
+def test_request_session_writes_after_a_concurrent_commit(app):
+    # Fuera del escritor: leer, que otra conexión confirme y luego escribir no debe fallar con "database is locked"
+    with app.app_context():
+        db.session.add(DashboardCounter(name='contador', value=0))
+        db.session.commit()
+
+        assert db.session.get(DashboardCounter, 'contador').value == 0
+        with db.engine.begin() as connection:
+            connection.execute(db.update(DashboardCounter).values(value=DashboardCounter.value + 1))
+        db.session.execute(db.update(DashboardCounter).values(value=DashboardCounter.value + 1))
+        db.session.commit()
+
+        assert db.session.execute(db.select(DashboardCounter.value)).scalar() == 2
+
+
+def test_writer_job_writes_after_a_concurrent_commit(app, writer):
+    # El grupo empieza con BEGIN IMMEDIATE: otra conexión espera su commit en lugar de cambiarle la base
+    with app.app_context():
+        db.session.add(DashboardCounter(name='contador', value=0))
+        db.session.commit()
+    started, release = threading.Event(), threading.Event()
+
+    def read_then_write():
+        value = db.session.get(DashboardCounter, 'contador').value
+        started.set()
+        release.wait(WAIT)
+        db.session.execute(db.update(DashboardCounter).values(value=value + 10))
+        return value
+
+    future = writer.submit(read_then_write)
+    assert started.wait(WAIT)
+
+    def concurrent_update():
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(db.update(DashboardCounter).values(value=DashboardCounter.value + 1))
+
+    other = threading.Thread(target=concurrent_update)
+    other.start()
+    release.set()
+    assert future.result(WAIT) == 0
+    other.join(WAIT)
+    assert saved_values(app) == [11]
+
+
+def test_execute_without_group_commit_runs_in_the_request(app, writer):
+    app.config['GROUP_COMMIT_ENABLED'] = False
+    with app.app_context():
+        assert writer.execute(add_counter, 'a') == 'a'
+        with pytest.raises(ValueError):
+            writer.execute(fail, 'b')
+        assert not db.session().in_transaction()
+    assert writer._thread is None
+    assert saved_names(app) == {'a'}
@@ -0,0 +1,22 @@
+import re
+
+# Funciones de validación de seguridad
+def validate_employee_id(employee_id):
+    """Validar formato de ID de empleado"""
+    if not employee_id or len(employee_id) > 20:
+        return False
+    return re.match(r'^[A-Za-z0-9_-]+$', employee_id) is not None
+
+def validate_email(email):
+    """Validar formato de email"""
+    if not email or len(email) > 120:
+        return False
+    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return re.match(pattern, email) is not None
+
+def validate_name(name):
+    """Validar nombres (solo letras, espacios y acentos)"""
+    if not name or len(name) > 100:
+        return False
+    pattern = r'^[a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+$'
+    return re.match(pattern, name) is not None